@@ -0,0 +1,89 @@
+"""
+Import time benchmark of the PID extension modules.
+
+Each measurement is done in a fresh interpreter:
+
+* cold: the bytecode cache is redirected to an empty directory, so every module has to be compiled again
+* warm: the bytecode cache is redirected to a directory primed by a first import
+
+Usage:
+
+    python benchmarks/import_time.py                      # print the results
+    python benchmarks/import_time.py --save results.json  # also save them
+    python benchmarks/import_time.py --compare results.json --tolerance 0.2  # fail if 20% slower than saved ones
+    python benchmarks/import_time.py --compare            # compare to import_time_baseline.json
+
+import_time_baseline.json, next to this script, holds the reference results. Import times depend on the machine and
+on the installed pymodaq version: save a new baseline (--save benchmarks/import_time_baseline.json) when they change.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+MODULES = ['pymodaq_pid.utils', 'pymodaq_pid.pid_controller']
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'import_time_baseline.json')
+
+SNIPPET = 'import time; t0 = time.perf_counter(); import {module}; print(time.perf_counter() - t0)'
+
+
+def time_import(module, pycache_prefix):
+    # the bytecode has to be written to pycache_prefix for the warm measurements
+    env = {key: value for key, value in os.environ.items() if key != 'PYTHONDONTWRITEBYTECODE'}
+    result = subprocess.run([sys.executable, '-X', f'pycache_prefix={pycache_prefix}', '-c',
+                             SNIPPET.format(module=module)], capture_output=True, text=True, check=True, env=env)
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def benchmark(module, repeat=5):
+    cold = []
+    for ind in range(repeat):
+        with tempfile.TemporaryDirectory() as pycache_prefix:
+            cold.append(time_import(module, pycache_prefix))
+    with tempfile.TemporaryDirectory() as pycache_prefix:
+        time_import(module, pycache_prefix)  # prime the bytecode cache
+        if not any(files for root, dirs, files in os.walk(pycache_prefix)):
+            raise RuntimeError(f'The bytecode cache {pycache_prefix} has not been written by the priming import')
+        warm = [time_import(module, pycache_prefix) for ind in range(repeat)]
+    return dict(cold=statistics.median(cold), cold_min=min(cold),
+                warm=statistics.median(warm), warm_min=min(warm))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=5, help='number of interpreters started per measurement')
+    parser.add_argument('--save', help='json file where to save the results')
+    parser.add_argument('--compare', nargs='?', const=BASELINE,
+                        help='json file of reference results, import_time_baseline.json if not given')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slow down with --compare')
+    args = parser.parse_args()
+
+    results = dict()
+    for module in MODULES:
+        results[module] = benchmark(module, args.repeat)
+        print(f"{module}: cold {results[module]['cold'] * 1000:.1f} ms, "
+              f"warm {results[module]['warm'] * 1000:.1f} ms (medians of {args.repeat})")
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            reference = json.load(f)
+        failed = False
+        for module in results:
+            for key in ['cold', 'warm']:
+                if module in reference and results[module][key] > reference[module][key] * (1 + args.tolerance):
+                    print(f'{module} {key} import regressed: {results[module][key] * 1000:.1f} ms vs '
+                          f'{reference[module][key] * 1000:.1f} ms')
+                    failed = True
+        sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,255 @@
+"""
+Soak benchmark of the PID loop: memory and latency regression tracking over millions of iterations.
+
+A PIDRunner executes the simulated model (PIDModelSimulated) against a simulated plant in its own QThread, as it does
+from DAQ_PID, on the real clock and as fast as possible. Its output signal is consumed in the main thread by a stand-in
+of DAQ_PID.process_output (and optionally by the LODViewer history plots). Every interval the benchmark samples:
+
+* rss: resident memory of the process
+* traced: memory allocated by python and still alive (tracemalloc)
+* blocks: number of python memory blocks still alive (tracemalloc), i.e. the python objects count
+* gc_objects: number of objects tracked by the garbage collector
+* period percentiles: p50, p99, p99.9 and max of the loop iteration periods since the previous sample
+* queue_depth: number of output signals emitted by the loop and not yet processed by the main thread
+
+After the warm up samples, a growth of the memory counters or a latency/queue depth beyond the thresholds makes the
+benchmark fail (exit code 1).
+
+Usage:
+
+    python benchmarks/soak.py --iterations 1000000
+    python benchmarks/soak.py --duration 3600 --viewer --save soak.json
+"""
+import argparse
+import gc
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import deque
+
+import numpy as np
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5 import QtCore, QtWidgets  # noqa: E402
+
+
+def get_rss():
+    """Resident memory of the process in bytes"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        try:
+            import psutil
+            return psutil.Process().memory_info().rss
+        except ImportError:
+            import resource  # peak instead of current resident memory
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class LoopProbe:
+    """Count the loop iterations and keep their periods, called from the loop thread on each acquisition"""
+
+    def __init__(self, grab_datas, size=1000000):
+        self._grab_datas = grab_datas
+        self.periods = deque(maxlen=size)
+        self.iterations = 0
+        self._last = None
+        self._lock = threading.Lock()
+
+    def grab_datas(self, **kwargs):
+        now = time.perf_counter()
+        with self._lock:
+            if self._last is not None:
+                self.periods.append(now - self._last)
+            self._last = now
+            self.iterations += 1
+        return self._grab_datas(**kwargs)
+
+    def pop_periods(self):
+        with self._lock:
+            periods = np.array(self.periods)
+            self.periods.clear()
+        return periods
+
+
+class OutputConsumer(QtCore.QObject):
+    """Stand-in of DAQ_PID.process_output, living in the main thread"""
+
+    def __init__(self, viewer=False):
+        super().__init__()
+        self.emitted = 0
+        self.received = 0
+        self.viewers = []
+        if viewer:
+            from pymodaq_pid.lod import LODViewer
+            self.widgets = [QtWidgets.QWidget(), QtWidgets.QWidget()]
+            self.viewers = [LODViewer(widget) for widget in self.widgets]
+
+    def count_emitted(self, datas):
+        self.emitted += 1  # direct connection: called from the loop thread
+
+    def process_output(self, datas):
+        self.received += 1
+        if self.viewers:
+            self.viewers[0].show_data([[dat] for dat in datas['output']])
+            self.viewers[1].show_data([[dat] for dat in datas['input']])
+
+    @property
+    def queue_depth(self):
+        return self.emitted - self.received
+
+
+class Soak(QtCore.QObject):
+    command_pid = QtCore.pyqtSignal(object)
+
+    def __init__(self, args):
+        super().__init__()
+        from pymodaq_pid.clock import RealClock
+        from pymodaq_pid.simulation import PIDSimulation, PIDModelSimulated, FirstOrderPlant
+
+        self.args = args
+        self.simulation = PIDSimulation(PIDModelSimulated, FirstOrderPlant(gain=2., tau=0.5, noise=0.01),
+                                        setpoint=1., sample_time=args.sample_time / 1000, clock=RealClock())
+        module_manager = self.simulation.module_manager
+        module_manager.history = dict(time=deque(maxlen=1), measurement=deque(maxlen=1), position=deque(maxlen=1))
+        self.probe = LoopProbe(module_manager.grab_datas)
+        module_manager.grab_datas = self.probe.grab_datas
+
+        self.runner = self.simulation.runner
+        self.runner.refreshing_ouput_time = args.refresh_time
+        self.runner.killTimer(self.runner.timer)
+        self.runner.timer = self.runner.startTimer(args.refresh_time)
+        self.consumer = OutputConsumer(args.viewer)
+        self.runner.pid_output_signal.connect(self.consumer.count_emitted, QtCore.Qt.DirectConnection)
+        self.runner.pid_output_signal.connect(self.consumer.process_output, QtCore.Qt.QueuedConnection)
+        self.runner.pause_PID(False)
+
+        self.command_pid.connect(self.runner.queue_command)
+        self.thread = QtCore.QThread()
+        self.runner.moveToThread(self.thread)
+        self.samples = []
+        self.start_time = None
+        self.timer = QtCore.QTimer()
+        self.timer.timeout.connect(self.sample)
+        self.stopping = False
+
+    def run(self):
+        from pymodaq.daq_utils.daq_utils import ThreadCommand
+
+        tracemalloc.start()
+        self.thread.start()
+        self.start_time = time.perf_counter()
+        self.command_pid.emit(ThreadCommand('start_PID', []))
+        self.timer.start(int(self.args.interval * 1000))
+        QtWidgets.QApplication.instance().exec_()
+        tracemalloc.stop()
+        return self.samples
+
+    def sample(self):
+        elapsed = time.perf_counter() - self.start_time
+        queue_depth = self.consumer.queue_depth  # before the main thread processes the pending signals
+        periods = self.probe.pop_periods()
+        traced, traced_peak = tracemalloc.get_traced_memory()
+        blocks = sum(stat.count for stat in tracemalloc.take_snapshot().statistics('filename'))
+        sample = dict(elapsed=elapsed, iterations=self.probe.iterations, rss=get_rss(), traced=traced,
+                      blocks=blocks, gc_objects=len(gc.get_objects()), queue_depth=queue_depth)
+        if len(periods) != 0:
+            sample.update(p50=float(np.percentile(periods, 50)), p99=float(np.percentile(periods, 99)),
+                          p999=float(np.percentile(periods, 99.9)), max=float(periods.max()))
+        self.samples.append(sample)
+        print(format_sample(sample), flush=True)
+
+        done = self.probe.iterations >= self.args.iterations or \
+            (self.args.duration is not None and elapsed >= self.args.duration)
+        if done and not self.stopping:
+            self.stopping = True
+            self.timer.stop()
+            from pymodaq.daq_utils.daq_utils import ThreadCommand
+            future = self.runner.submit_command(ThreadCommand('stop_PID'))
+            while not future.done():
+                QtWidgets.QApplication.processEvents()
+                time.sleep(0.01)
+            self.thread.quit()
+            self.thread.wait()
+            QtWidgets.QApplication.instance().quit()
+
+
+def format_sample(sample):
+    text = (f"{sample['elapsed']:8.1f}s {sample['iterations']:10d} it | rss {sample['rss'] / 2**20:7.1f} MB | "
+            f"traced {sample['traced'] / 2**20:6.2f} MB | blocks {sample['blocks']:8d} | "
+            f"gc {sample['gc_objects']:8d} | queue {sample['queue_depth']:5d}")
+    if 'p50' in sample:
+        text += (f" | period p50 {sample['p50'] * 1e3:.3f} p99 {sample['p99'] * 1e3:.3f} "
+                 f"p99.9 {sample['p999'] * 1e3:.3f} max {sample['max'] * 1e3:.3f} ms")
+    return text
+
+
+def check(samples, args):
+    """Compare the last sample to the first one after the warm up
+
+    Returns
+    -------
+    list of str: the failed checks
+    """
+    if len(samples) <= args.warmup:
+        return [f'not enough samples ({len(samples)}) after the {args.warmup} warm up ones']
+    reference, last = samples[args.warmup], samples[-1]
+    failures = []
+    for key, limit, scale, unit in [('rss', args.max_rss_growth, 2**20, 'MB'),
+                                    ('traced', args.max_traced_growth, 2**20, 'MB'),
+                                    ('blocks', args.max_blocks_growth, 1, 'blocks'),
+                                    ('gc_objects', args.max_objects_growth, 1, 'objects')]:
+        growth = (last[key] - reference[key]) / scale
+        if growth > limit:
+            failures.append(f'{key} grew by {growth:.2f} {unit} (limit {limit} {unit})')
+    for sample in samples[args.warmup:]:
+        if sample['queue_depth'] > args.max_queue_depth:
+            failures.append(f"queue depth reached {sample['queue_depth']} at {sample['elapsed']:.1f}s "
+                            f"(limit {args.max_queue_depth})")
+            break
+    p99 = [sample['p99'] for sample in samples[args.warmup:] if 'p99' in sample]
+    if len(p99) != 0 and max(p99) * 1e3 > args.max_p99:
+        failures.append(f'loop period p99 reached {max(p99) * 1e3:.3f} ms (limit {args.max_p99} ms)')
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=1000000, help='number of loop iterations')
+    parser.add_argument('--duration', type=float, default=None, help='maximum duration in seconds')
+    parser.add_argument('--sample-time', type=float, default=0., help='sample time of the loop (ms)')
+    parser.add_argument('--refresh-time', type=int, default=10, help='period of the output signal (ms)')
+    parser.add_argument('--interval', type=float, default=5., help='period of the samples (s)')
+    parser.add_argument('--warmup', type=int, default=2, help='number of samples ignored by the checks')
+    parser.add_argument('--viewer', action='store_true', help='also feed the LODViewer history plots')
+    parser.add_argument('--max-rss-growth', type=float, default=20., help='MB')
+    parser.add_argument('--max-traced-growth', type=float, default=5., help='MB')
+    parser.add_argument('--max-blocks-growth', type=int, default=20000)
+    parser.add_argument('--max-objects-growth', type=int, default=20000)
+    parser.add_argument('--max-p99', type=float, default=50., help='maximum p99 of the loop period (ms)')
+    parser.add_argument('--max-queue-depth', type=int, default=1000)
+    parser.add_argument('--save', help='json file where to save the samples')
+    args = parser.parse_args()
+
+    app = QtWidgets.QApplication(sys.argv)
+    samples = Soak(args).run()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump(dict(args=vars(args), samples=samples), f, indent=2)
+
+    failures = check(samples, args)
+    for failure in failures:
+        print(f'FAILED: {failure}')
+    if failures:
+        sys.exit(1)
+    print('soak passed')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+"""
+Acquisition broker shared by the PID loops of a process.
+
+Loops reading the same detectors subscribe to the same AcquisitionBroker. When a loop needs data, it gets the last
+frame grabbed by any subscriber if it did not see it yet, or waits for the acquisition in progress if another loop is
+grabbing, or else grabs a new frame itself: the detectors are triggered once per frame whatever the number of loops.
+All subscribers receive the very same data objects (no copy), they must consider them as read only.
+
+Each frame is stamped when grabbed, with the clock of the subscriber that created the broker, so that the loops
+reusing it get its acquisition time rather than the time they received it.
+
+Brokers are reference counted: the first subscription to a set of detectors creates its broker, the last one closed
+releases it together with its last frame.
+"""
+import threading
+import time
+
+_brokers = dict([])
+_brokers_lock = threading.Lock()
+
+
+def get_broker_key(module_manager):
+    """Key identifying the detectors grabbed by a modules manager: loops with the same key share their acquisitions"""
+    detectors = tuple(module_manager.get_mod_from_name(name, 'det') for name in module_manager.selected_detectors_name)
+    if len(detectors) == 0 or None in detectors:
+        return id(module_manager), tuple(module_manager.selected_detectors_name)
+    return tuple(id(detector) for detector in detectors)
+
+
+class AcquisitionBroker:
+    """Single acquisition path for the loops sharing a set of detectors, to be obtained through subscribe
+
+    Parameters
+    ----------
+    key: (tuple) the broker key, see get_broker_key
+    clock: (RealClock or VirtualClock) clock stamping the frames, defaults to time.perf_counter
+    """
+
+    def __init__(self, key, clock=None):
+        self.key = key
+        self._now = time.perf_counter if clock is None else clock.now
+        self.references = 0
+        self.grabs = 0  # number of frames effectively acquired
+        self._frame = None
+        self._frame_time = None
+        self._sequence = 0
+        self._grabbing = False
+        self._condition = threading.Condition()
+
+    @classmethod
+    def subscribe(cls, module_manager, clock=None):
+        """Get a subscription to the broker of the detectors selected in module_manager
+
+        Parameters
+        ----------
+        module_manager: (ModulesManager) the modules manager of the subscribing loop
+        clock: (RealClock or VirtualClock) clock of the loop, stamping the frames if the broker is created
+
+        Returns
+        -------
+        Subscription: to be closed once the loop does not acquire anymore
+        """
+        key = get_broker_key(module_manager)
+        with _brokers_lock:
+            broker = _brokers.get(key, None)
+            if broker is None:
+                broker = cls(key, clock)
+                _brokers[key] = broker
+            broker.references += 1
+        return Subscription(broker, module_manager)
+
+    def release(self):
+        with _brokers_lock:
+            self.references -= 1
+            if self.references == 0:
+                if _brokers.get(self.key, None) is self:
+                    del _brokers[self.key]
+                with self._condition:
+                    self._frame = None
+
+    def grab(self, module_manager, last_sequence=0, max_age=None):
+        """Get a frame newer than last_sequence
+
+        Parameters
+        ----------
+        module_manager: (ModulesManager) used if a new frame has to be acquired
+        last_sequence: (int) sequence number of the last frame seen by the caller
+        max_age: (float) if not None, a frame older than this (in seconds) is not reused
+
+        Returns
+        -------
+        (OrderedDict, int, float): the frame, as returned by grab_datas, its sequence number and the time it was
+            grabbed
+        """
+        with self._condition:
+            while True:
+                if self._frame is not None and self._sequence > last_sequence and \
+                        (max_age is None or self._now() - self._frame_time <= max_age):
+                    return self._frame, self._sequence, self._frame_time
+                if not self._grabbing:
+                    self._grabbing = True
+                    break
+                sequence = self._sequence
+                self._condition.wait()
+                if self._sequence > sequence:
+                    # the frame just acquired by another subscriber is fresh whatever max_age
+                    return self._frame, self._sequence, self._frame_time
+
+        frame = None
+        try:
+            frame = module_manager.grab_datas()
+        finally:
+            with self._condition:
+                self._grabbing = False
+                if frame is not None:
+                    self.grabs += 1
+                    self._sequence += 1
+                    self._frame = frame
+                    self._frame_time = self._now()
+                sequence, frame_time = self._sequence, self._frame_time
+                self._condition.notify_all()
+        return frame, sequence, frame_time
+
+
+class Subscription:
+    """Access of one loop to an AcquisitionBroker"""
+
+    def __init__(self, broker, module_manager):
+        self.broker = broker
+        self.module_manager = module_manager
+        self.sequence = 0
+        self.frame_time = None  # time the last returned frame was grabbed
+        self.closed = False
+
+    def grab(self, max_age=None):
+        """Get the detectors data of a frame not seen yet by this subscription (see AcquisitionBroker.grab)"""
+        frame, self.sequence, self.frame_time = self.broker.grab(self.module_manager, self.sequence, max_age)
+        return frame
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.broker.release()
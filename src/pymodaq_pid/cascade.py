@@ -0,0 +1,65 @@
+"""
+Outer loop of cascaded PID controllers: its output becomes the setpoint of the PID executed by the PIDRunner (the
+inner loop). Both loops are scheduled by the runner loop, the outer one at its own (slower) rate.
+"""
+from simple_pid import PID
+
+
+class OuterLoop:
+    """Outer PID loop declared by the cascade attribute of a PIDModelGeneric subclass
+
+    Parameters
+    ----------
+    sample_time: (float) period of the outer loop in seconds
+    konstants: (dict) with kp, ki and kd keys
+    limits: (dict) same structure as PIDModelGeneric.limits, bounding the setpoint given to the inner loop
+    setpoint: (float) initial setpoint of the outer loop
+    """
+
+    def __init__(self, sample_time=0.1, konstants=dict(kp=1, ki=0.1, kd=0), limits=dict([]), setpoint=0.):
+        output_limits = [None, None]
+        for ind, limit in enumerate(['min', 'max']):
+            if limit in limits and limits[limit]['state']:
+                output_limits[ind] = limits[limit]['value']
+
+        self.sample_time = sample_time
+        self.pid = PID(konstants['kp'], konstants['ki'], konstants['kd'], setpoint=setpoint, sample_time=None,
+                       output_limits=output_limits, auto_mode=False)
+        self.input = 0.
+        self.output = None
+        self.next_time = None
+        self.last_time = None
+
+    @classmethod
+    def from_model(cls, model, setpoint=0.):
+        return cls(setpoint=setpoint, **model.cascade)
+
+    def due(self, now):
+        return self.next_time is None or now >= self.next_time
+
+    def step(self, now, input):
+        """Execute the outer PID
+
+        Parameters
+        ----------
+        now: (float) current time in seconds
+        input: (float) measurement of the outer loop
+
+        Returns
+        -------
+        float: the setpoint of the inner loop, None in manual mode before any computation
+        """
+        self.input = input
+        dt = self.sample_time if self.last_time is None else max(now - self.last_time, 1e-9)
+        self.output = self.pid(input, dt=dt)
+        self.last_time = now
+        # keep the outer rate without accumulating delays if the runner loop was late, but never schedule the next
+        # step before a full sample time: a too short dt would make the derivative term spike
+        if self.next_time is None or self.next_time + self.sample_time <= now:
+            self.next_time = now + self.sample_time
+        else:
+            self.next_time += self.sample_time
+        return self.output
+
+    def set_auto_mode(self, enabled, last_output=None):
+        self.pid.set_auto_mode(enabled, last_output)
@@ -0,0 +1,73 @@
+"""
+Clocks of the PID loop: the real one and a virtual one used to simulate loops faster than real time.
+"""
+import threading
+import time
+
+
+class RealClock:
+    """Wall clock, the loop waits for real between samples"""
+    simulated = False
+
+    def __init__(self):
+        # the detectors stamp their data in seconds since the epoch, the loop times are perf_counter ones
+        self._epoch_offset = time.time() - time.perf_counter()
+
+    def now(self):
+        return time.perf_counter()
+
+    def time(self):
+        """Current time in seconds since the epoch, the time base of the detectors acq_time_s"""
+        return time.time()
+
+    def from_epoch(self, stamp):
+        """Convert a time in seconds since the epoch (acq_time_s of the detectors) to the time base of now"""
+        return stamp - self._epoch_offset
+
+    def sleep(self, duration, event=None):
+        """Wait duration seconds or until event is set
+
+        Returns
+        -------
+        bool: True if the event has been set
+        """
+        if event is None:
+            time.sleep(duration)
+            return False
+        return event.wait(duration)
+
+
+class VirtualClock:
+    """Clock only advancing when the loop sleeps, making simulated runs as fast as the computation allows and
+    deterministic
+
+    Parameters
+    ----------
+    start: (float) initial time in seconds
+    epoch: (float) time since the epoch corresponding to a null time, used by the simulated detectors stamps
+    """
+    simulated = True
+
+    def __init__(self, start=0., epoch=0.):
+        self._time = start
+        self.epoch = epoch
+        self._lock = threading.Lock()
+
+    def now(self):
+        return self._time
+
+    def time(self):
+        """Simulated time in seconds since the epoch, the time base of the detectors acq_time_s"""
+        return self.epoch + self._time
+
+    def from_epoch(self, stamp):
+        """Convert a simulated time since the epoch to the time base of now"""
+        return stamp - self.epoch
+
+    def advance(self, duration):
+        with self._lock:
+            self._time += duration
+
+    def sleep(self, duration, event=None):
+        self.advance(duration)
+        return event is not None and event.is_set()
@@ -0,0 +1,102 @@
+"""
+Deadlines for the blocking stages of the PID loop (acquisition and actuation).
+
+Each stage is executed by a dedicated daemon worker thread (started on the first call with a timeout, stopped by
+close) while the loop thread waits for it at most the stage timeout. A stage that did not return in time is an overrun: the loop thread gets back control and applies the
+overrun policy while the hung call is left to complete (or not) in its worker. As long as it has not returned, the
+next calls of this stage are refused and counted as overruns too.
+"""
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError
+
+
+class StageOverrun(Exception):
+    """Raised when a loop stage did not complete before its deadline"""
+
+    def __init__(self, stage, timeout, still_running=False, refusals=0):
+        self.stage = stage
+        self.timeout = timeout
+        self.still_running = still_running
+        self.refusals = refusals  # consecutive refused calls while the overran one is still running
+        if still_running:
+            message = f'PID {stage} stage refused: previous call still running after its {timeout:.3f}s deadline'
+        else:
+            message = f'PID {stage} stage overran its {timeout:.3f}s deadline'
+        super().__init__(message)
+
+
+class StageDeadline:
+    """Execute a loop stage with a deadline
+
+    Parameters
+    ----------
+    stage: (str) name of the stage, used in the overrun reports
+    timeout: (float) deadline in seconds, None or 0 to wait forever (the call is then done in the calling thread)
+    """
+
+    def __init__(self, stage, timeout=None):
+        self.stage = stage
+        self.timeout = timeout
+        self.overruns = 0
+        self.refusals = 0
+        self._jobs = queue.Queue()
+        self._pending = None
+        self._worker = None
+
+    def _work(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                break
+            future, fun, args, kwargs = job
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fun(*args, **kwargs))
+            except BaseException as e:
+                future.set_exception(e)
+
+    @property
+    def busy(self):
+        """True if a call that overran its deadline is still running"""
+        return self._pending is not None and not self._pending.done()
+
+    @property
+    def worker_ident(self):
+        """Thread identifier of the worker, None if not started"""
+        return None if self._worker is None else self._worker.ident
+
+    def run(self, fun, *args, **kwargs):
+        """Call fun(*args, **kwargs) and return its result if it completes before the deadline
+
+        Raises
+        ------
+        StageOverrun: if the call did not complete in time or a previous call is still running
+        """
+        if self.busy:
+            self.overruns += 1
+            self.refusals += 1
+            raise StageOverrun(self.stage, self.timeout, still_running=True, refusals=self.refusals)
+        self._pending = None
+        self.refusals = 0
+        if not self.timeout:
+            return fun(*args, **kwargs)
+
+        if self._worker is None:
+            self._worker = threading.Thread(target=self._work, name=f'pid_{self.stage}', daemon=True)
+            self._worker.start()
+        future = Future()
+        self._jobs.put((future, fun, args, kwargs))
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            self._pending = future
+            self.overruns += 1
+            raise StageOverrun(self.stage, self.timeout)
+
+    def close(self):
+        """Stop the worker once its current call (if any) returns"""
+        if self._worker is not None:
+            self._jobs.put(None)
+            self._worker = None
@@ -0,0 +1,207 @@
+"""
+Dispatch of the PID outputs to the actuators.
+
+Commands are sent to the actuators threads as the modules manager does, with non blocking signals. Actuators sharing
+a controller (master and slaves of a multi-axes plugin, having the same controller_ID) form a group moved one after
+the other: each command is sent once the previous actuator of the group reached its target. Groups are moved
+concurrently from a pool of worker threads, so the actuation latency no longer grows with the number of controllers.
+
+When the loop waits for the moves, it waits for all groups. Otherwise the commands of single actuator groups are sent
+from the loop thread and the other groups are moved in the background, the loop not waiting for them: a group still
+moving when new values come moves to the latest values once done, intermediate ones being skipped.
+
+In both cases, the time taken by each actuator from its command to its move_done_signal is kept in
+ActuatorDispatcher.timings.
+"""
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import Qt
+from pymodaq.daq_utils.daq_utils import ThreadCommand, set_logger, get_module_name
+
+logger = set_logger(get_module_name(__file__))
+
+
+def get_controller_id(actuator):
+    """Get the controller_ID of a DAQ_Move, None if not available"""
+    try:
+        return actuator.settings.child('main_settings', 'controller_ID').value()
+    except Exception:
+        return None
+
+
+class _MoveDone:
+    """Flag set by the move_done_signal of an actuator, to be waited for from a worker thread, also timing the moves"""
+
+    def __init__(self, actuator):
+        self.actuator = actuator
+        self.event = threading.Event()
+        self.command_time = None
+        self.elapsed = None  # time in seconds from the last command to its move done
+        self.connected = False
+        if hasattr(actuator, 'move_done_signal'):
+            # direct connection: the flag is set from the thread emitting the signal, whatever the receiver thread
+            actuator.move_done_signal.connect(self.set_done, Qt.DirectConnection)
+            self.connected = True
+
+    def set_command(self):
+        self.event.clear()
+        self.command_time = time.perf_counter()
+
+    def set_done(self, name, position):
+        if self.command_time is not None:
+            self.elapsed = time.perf_counter() - self.command_time
+            self.command_time = None
+        self.event.set()
+
+    def disconnect(self):
+        if self.connected:
+            try:
+                self.actuator.move_done_signal.disconnect(self.set_done)
+            except (TypeError, RuntimeError):
+                pass
+            self.connected = False
+
+
+class _ActuatorGroup:
+    """Actuators sharing a controller, with the latest values waiting for the group to be moved again"""
+
+    def __init__(self):
+        self.members = []  # (index in the output values, name, actuator, _MoveDone)
+        self.lock = threading.Lock()
+        self.moving = False
+        self.pending = None  # (values, mode) received while moving
+
+
+class ActuatorDispatcher:
+    """Send the PID outputs to the actuators, concurrently for actuators on independent controllers
+
+    Parameters
+    ----------
+    module_manager: (ModulesManager) the dashboard modules manager
+    actuators_name: (list of str) names of the actuators in the order of the output values
+    wait: (bool) if True, move returns once all actuators reached their target, else once the commands are sent.
+        To be changed through set_wait
+    timeout: (float) maximum time in seconds waited for the move done of an actuator
+    """
+
+    def __init__(self, module_manager, actuators_name, wait=False, timeout=10.):
+        self.module_manager = module_manager
+        self.actuators_name = list(actuators_name)
+        self.wait = wait
+        self.timeout = timeout
+        self._timings = OrderedDict([(name, None) for name in self.actuators_name])
+
+        self.groups = None
+        self._move_dones = OrderedDict([])
+        self._executor = None
+        actuators = [module_manager.get_mod_from_name(name, 'act') for name in self.actuators_name]
+        if len(actuators) > 1 and None not in actuators:
+            groups = OrderedDict([])
+            for ind, (name, actuator) in enumerate(zip(self.actuators_name, actuators)):
+                controller_id = get_controller_id(actuator)
+                key = name if controller_id is None else controller_id
+                self._move_dones[name] = _MoveDone(actuator)
+                groups.setdefault(key, _ActuatorGroup()).members.append((ind, name, actuator, self._move_dones[name]))
+            self.groups = list(groups.values())
+        self.set_wait(wait)
+
+    def set_wait(self, wait):
+        self.wait = wait
+        # workers are needed to wait for several groups concurrently or to serialize a group without waiting for it
+        needed = self.groups is not None and \
+            ((wait and len(self.groups) > 1) or any(len(group.members) > 1 for group in self.groups))
+        if needed and self._executor is None:
+            self._executor = ThreadPoolExecutor(len(self.groups), thread_name_prefix='pid_actuation')
+        elif not needed and self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+
+    @property
+    def parallel(self):
+        """True if the actuators are commanded individually (there are several and all are known)"""
+        return self.groups is not None
+
+    @property
+    def timings(self):
+        """Time in seconds from the last command to the move done of each actuator"""
+        for name, move_done in self._move_dones.items():
+            self._timings[name] = move_done.elapsed
+        return self._timings
+
+    def move(self, values, mode='abs'):
+        """Move the actuators to values
+
+        Parameters
+        ----------
+        values: (list of float) one value per actuator, in the order of actuators_name
+        mode: (str) either 'abs' for absolute positioning or 'rel' for relative
+        """
+        if not self.parallel:
+            start = time.perf_counter()
+            self.module_manager.move_actuators(values, mode, poll=self.wait)
+            elapsed = time.perf_counter() - start
+            for name in self.actuators_name:
+                self._timings[name] = elapsed
+            return
+
+        if mode not in ['abs', 'rel']:
+            raise ValueError(f'Invalid positioning mode: {mode}')
+        if len(values) != len(self.actuators_name):
+            raise ValueError('Invalid number of positions compared to the actuators')
+        if self.wait:
+            if self._executor is None:  # single actuator groups: nothing to gain from other threads
+                for group in self.groups:
+                    self._move_group(group, values, mode)
+            else:
+                futures = [self._executor.submit(self._move_group, group, values, mode) for group in self.groups]
+                for future in futures:
+                    future.result()
+            return
+
+        for group in self.groups:
+            if len(group.members) == 1:  # the signals are not blocking
+                self._move_group(group, values, mode)
+                continue
+            with group.lock:
+                if group.moving:
+                    group.pending = (values, mode)
+                    continue
+                group.moving = True
+            self._executor.submit(self._move_group_latest, group, values, mode)
+
+    def _move_group(self, group, values, mode):
+        command = 'move_Abs' if mode == 'abs' else 'move_Rel'
+        for ind_member, (ind, name, actuator, move_done) in enumerate(group.members):
+            move_done.set_command()
+            actuator.command_stage.emit(ThreadCommand(command=command, attributes=[values[ind], self.wait]))
+            # the next actuator of the group is commanded once this one is done, the last one only if waiting
+            if (self.wait or ind_member < len(group.members) - 1) and move_done.connected and \
+                    not move_done.event.wait(self.timeout):
+                logger.warning(f'{name} did not reach its target within {self.timeout:.3f}s')
+
+    def _move_group_latest(self, group, values, mode):
+        """Move a group in the background, then again to the values received meanwhile if any"""
+        try:
+            while True:
+                self._move_group(group, values, mode)
+                with group.lock:
+                    if group.pending is None:
+                        group.moving = False
+                        return
+                    (values, mode), group.pending = group.pending, None
+        except Exception as e:
+            with group.lock:
+                group.moving = False
+                group.pending = None
+            logger.exception(str(e))
+
+    def close(self):
+        executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False)
+        for move_done in self._move_dones.values():
+            move_done.event.set()  # releases the workers waiting for a move done
+            move_done.disconnect()
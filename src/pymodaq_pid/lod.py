@@ -0,0 +1,178 @@
+"""
+Level of detail decimation of the PID loop history.
+
+MinMaxPyramid keeps the full history of a signal plus coarser levels in which each point is the (min, max) envelope
+of `factor` points of the level below. It is updated incrementally (amortized O(1) per sample) and any time range
+can be rendered with a bounded number of points while keeping the spikes visible.
+"""
+import time
+
+import numpy as np
+from PyQt5 import QtWidgets
+import pyqtgraph as pg
+
+
+class _Level:
+    """Growable arrays of (x, ymin, ymax) buckets"""
+
+    def __init__(self, capacity=1024):
+        self.x = np.zeros(capacity)
+        self.ymin = np.zeros(capacity)
+        self.ymax = np.zeros(capacity)
+        self.size = 0
+
+    def append(self, x, ymin, ymax):
+        if self.size == len(self.x):
+            self.x = np.resize(self.x, 2 * self.size)
+            self.ymin = np.resize(self.ymin, 2 * self.size)
+            self.ymax = np.resize(self.ymax, 2 * self.size)
+        self.x[self.size] = x
+        self.ymin[self.size] = ymin
+        self.ymax[self.size] = ymax
+        self.size += 1
+
+
+class MinMaxPyramid:
+    """Multi resolution min/max pyramid of a signal sampled at increasing x values
+
+    Parameters
+    ----------
+    factor: (int) number of buckets of a level merged into one bucket of the next level
+    """
+
+    def __init__(self, factor=4):
+        self.factor = factor
+        self.levels = [_Level()]
+        self._partials = []  # [x, ymin, ymax, count] of the bucket being filled for levels 1, 2...
+
+    def __len__(self):
+        return self.levels[0].size
+
+    def append(self, x, y):
+        self.levels[0].append(x, y, y)
+        ind_level = 0
+        ymin = ymax = y
+        while True:
+            if ind_level == len(self._partials):
+                self._partials.append([x, ymin, ymax, 0])
+                self.levels.append(_Level())
+            partial = self._partials[ind_level]
+            if partial[3] == 0:
+                partial[0] = x
+                partial[1] = ymin
+                partial[2] = ymax
+            else:
+                partial[1] = min(partial[1], ymin)
+                partial[2] = max(partial[2], ymax)
+            partial[3] += 1
+            if partial[3] < self.factor:
+                break
+            # the bucket is complete: push it to the next level and propagate it up
+            self.levels[ind_level + 1].append(partial[0], partial[1], partial[2])
+            x, ymin, ymax = partial[0], partial[1], partial[2]
+            partial[3] = 0
+            ind_level += 1
+
+    def _tail(self, ind_level):
+        """Envelope of the most recent samples not yet in a complete bucket of the given level"""
+        tail = None
+        for partial in self._partials[:ind_level]:
+            if partial[3] > 0:
+                if tail is None:
+                    tail = partial[:3]
+                else:
+                    tail = [partial[0], min(tail[1], partial[1]), max(tail[2], partial[2])]
+        return tail
+
+    def query(self, x0=None, x1=None, max_points=2000):
+        """Get at most max_points points describing the signal between x0 and x1
+
+        Returns
+        -------
+        (ndarray, ndarray): x and y arrays, on decimated levels each bucket is drawn as its min and max values
+        """
+        for ind_level, level in enumerate(self.levels):
+            start = 0 if x0 is None else max(np.searchsorted(level.x[:level.size], x0, side='right') - 1, 0)
+            stop = level.size if x1 is None else np.searchsorted(level.x[:level.size], x1, side='right') + 1
+            stop = min(stop, level.size)
+            npoints = stop - start if ind_level == 0 else 2 * (stop - start)
+            if npoints <= max_points or ind_level == len(self.levels) - 1:
+                break
+        if ind_level == 0:
+            return level.x[start:stop].copy(), level.ymin[start:stop].copy()
+
+        x = level.x[start:stop]
+        ymin = level.ymin[start:stop]
+        ymax = level.ymax[start:stop]
+        tail = self._tail(ind_level) if stop == level.size else None
+        if tail is not None:
+            x = np.append(x, tail[0])
+            ymin = np.append(ymin, tail[1])
+            ymax = np.append(ymax, tail[2])
+        return np.repeat(x, 2), np.column_stack((ymin, ymax)).ravel()
+
+
+class LODViewer:
+    """History plot of a few channels, redrawn from MinMaxPyramid objects with a bounded number of points
+
+    Meant as a replacement of the Viewer0D history for long running loops: show_data has the same signature.
+
+    Parameters
+    ----------
+    parent: (QWidget) widget in which the plot is created
+    max_points: (int) maximum number of points drawn per channel whatever the displayed time range
+    """
+
+    def __init__(self, parent, max_points=2000):
+        self.parent = parent
+        self.max_points = max_points
+        self.pyramids = []
+        self.curves = []
+        self.t0 = None
+
+        layout = QtWidgets.QVBoxLayout()
+        self.parent.setLayout(layout)
+        self.plot_widget = pg.PlotWidget()
+        self.plot_widget.setLabel('bottom', 'Time', units='s')
+        self.plot_widget.showGrid(x=True, y=True)
+        layout.addWidget(self.plot_widget)
+        self.view_box = self.plot_widget.getPlotItem().getViewBox()
+        self.view_box.sigXRangeChanged.connect(self.update_plot)
+        self._updating = False
+
+    def show_data(self, datas):
+        """
+        Parameters
+        ----------
+        datas: (list of list) one single value list per channel
+        """
+        now = time.perf_counter()
+        if self.t0 is None:
+            self.t0 = now
+        while len(self.pyramids) < len(datas):
+            self.pyramids.append(MinMaxPyramid())
+            self.curves.append(self.plot_widget.plot(pen=pg.intColor(len(self.curves))))
+        for pyramid, data in zip(self.pyramids, datas):
+            pyramid.append(now - self.t0, float(data[0]))
+        self.update_plot()
+
+    def clear(self):
+        self.pyramids = []
+        for curve in self.curves:
+            self.plot_widget.removeItem(curve)
+        self.curves = []
+        self.t0 = None
+
+    def update_plot(self, *args):
+        if self._updating:
+            return
+        self._updating = True
+        try:
+            if self.view_box.autoRangeEnabled()[0]:
+                x0, x1 = None, None
+            else:
+                x0, x1 = self.view_box.viewRange()[0]
+            for pyramid, curve in zip(self.pyramids, self.curves):
+                curve.setData(*pyramid.query(x0, x1, self.max_points))
+        finally:
+            self._updating = False
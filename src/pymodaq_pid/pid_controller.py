@@ -10,20 +10,29 @@ from pymodaq.daq_utils.daq_utils import ThreadCommand, set_param_from_param, get
 from pyqtgraph.parametertree import Parameter, ParameterTree
 import pymodaq.daq_utils.parameter.pymodaq_ptypes as custom_tree
 from pymodaq.daq_utils import gui_utils as gutils
-from pymodaq.daq_utils.plotting.viewer0D.viewer0D_main import Viewer0D
 from pymodaq.daq_utils.plotting.qled import QLED
-from pymodaq.daq_utils.managers.preset_manager import PresetManager
 
 
 import importlib
-from simple_pid import PID
 import time
+import queue
+import threading
+from concurrent.futures import Future
 import datetime
-from pymodaq.daq_viewer.daq_viewer_main import DAQ_Viewer
-from pymodaq.daq_move.daq_move_main import DAQ_Move
 import numpy as np
 from collections import OrderedDict
 from pymodaq_pid.pid_params import params
+from pymodaq_pid.telemetry import TelemetryPublisher, FLAG_SATURATED_MIN, FLAG_SATURATED_MAX, FLAG_PAUSED
+from pymodaq_pid.remote import PIDCommandServer
+from pymodaq_pid.deadlines import StageDeadline, StageOverrun
+from pymodaq_pid.trajectory import SetpointTrajectory
+from pymodaq_pid.snapshot import SNAPSHOT_VERSION, get_pid_state, set_pid_state, save_snapshot, load_snapshot
+from pymodaq_pid.utils import OutputToActuator, get_acquisition_time
+from pymodaq_pid.clock import RealClock
+from pymodaq_pid.dispatch import ActuatorDispatcher
+from pymodaq_pid.profiling import LoopProfiler
+from pymodaq_pid.schedule import GainSchedule
+from pymodaq_pid.broker import AcquisitionBroker
 
 logger = set_logger(get_module_name(__file__))
 
@@ -73,6 +82,7 @@ class DAQ_PID(QObject):
         self.module_manager = module_manager
         self.dock_area = area
         self.check_moving = False
+        self.remote_server = None
         self.setupUI()
 
         self.command_stage.connect(self.move_Abs)  # to be compatible with actuator modules within daq scan
@@ -113,17 +123,35 @@ class DAQ_PID(QObject):
             self.PIDThread.pid_runner = pid_runner
             pid_runner.pid_output_signal.connect(self.process_output)
             pid_runner.status_sig.connect(self.thread_status)
+            pid_runner.trajectory_signal.connect(self.process_trajectory)
             self.command_pid.connect(pid_runner.queue_command)
 
             pid_runner.moveToThread(self.PIDThread)
 
             self.PIDThread.start()
+            if self.settings.child('telemetry', 'telemetry_enabled').value():
+                self.command_pid.emit(ThreadCommand('update_telemetry', self.get_telemetry_options()))
+            self.set_remote_server()
+            self.command_pid.emit(ThreadCommand('update_snapshot', self.get_snapshot_options()))
+            if self.settings.child('snapshots', 'snapshot_restore').value():
+                self.restore_snapshot()
+            for timer in ['timeout', 'actuation_timeout']:
+                self.command_pid.emit(ThreadCommand('update_timer',
+                                                    [timer, self.settings.child('main_settings', timer).value()]))
+            self.command_pid.emit(ThreadCommand('update_options', dict(
+                overrun_policy=self.settings.child('main_settings', 'overrun_policy').value(),
+                safe_output=self.settings.child('main_settings', 'safe_output').value(),
+                parallel_actuation=self.settings.child('main_settings', 'parallel_actuation').value(),
+                wait_actuation=self.settings.child('main_settings', 'wait_actuation').value(),
+                gain_scheduling=self.settings.child('main_settings', 'pid_controls', 'gain_scheduling').value())))
             self.pid_led.set_as_true()
             self.enable_controls_pid_run(True)
 
         else:
             if hasattr(self, 'PIDThread'):
                 if self.PIDThread.isRunning():
+                    self.command_pid.emit(ThreadCommand('update_telemetry', dict(enabled=False)))
+                    self.set_remote_server(False)
                     try:
                         self.PIDThread.quit()
                     except Exception:
@@ -133,6 +161,93 @@ class DAQ_PID(QObject):
 
         self.Initialized_state = True
 
+    def get_telemetry_options(self):
+        enabled = self.settings.child('telemetry', 'telemetry_enabled').value()
+        if self.settings.child('telemetry', 'telemetry_socket').value() == 'unix':
+            address = self.settings.child('telemetry', 'telemetry_path').value()
+        else:
+            address = ('127.0.0.1', self.settings.child('telemetry', 'telemetry_port').value())
+        return dict(enabled=enabled, address=address,
+                    queue_size=self.settings.child('telemetry', 'telemetry_queue').value())
+
+    def set_remote_server(self, enabled=None):
+        """(Re)start or stop the remote control server of the current PID runner"""
+        if enabled is None:
+            enabled = self.settings.child('remote', 'remote_enabled').value()
+        if self.remote_server is not None:
+            self.remote_server.stop()
+            self.remote_server = None
+        if enabled and hasattr(self, 'PIDThread'):
+            if self.settings.child('remote', 'remote_socket').value() == 'unix':
+                address = self.settings.child('remote', 'remote_path').value()
+            else:
+                address = ('127.0.0.1', self.settings.child('remote', 'remote_port').value())
+            try:
+                self.remote_server = PIDCommandServer(self.PIDThread.pid_runner, address)
+                self.remote_server.start()
+            except Exception as e:
+                self.remote_server = None
+                logger.exception(str(e))
+
+    def get_snapshot_path(self):
+        path = self.settings.child('snapshots', 'snapshot_path').value()
+        if not path:
+            path = os.path.join(get_set_pid_path(), f"{self.settings.child('models', 'model_class').value()}"
+                                                    f"_snapshot.json")
+        return path
+
+    def get_profiling_options(self):
+        path = self.settings.child('profiling', 'profile_path').value()
+        if not path:
+            path = os.path.join(get_set_pid_path(), 'profiles')
+        return dict(enabled=self.settings.child('profiling', 'profiling_enabled').value(),
+                    iterations=self.settings.child('profiling', 'profile_iterations').value(), path=path)
+
+    def get_snapshot_options(self):
+        path = None
+        if self.settings.child('snapshots', 'snapshot_enabled').value():
+            path = self.get_snapshot_path()
+        return dict(path=path, period=self.settings.child('snapshots', 'snapshot_period').value())
+
+    def restore_snapshot(self):
+        """Send the last saved snapshot (if any) to the PID runner for a warm restart"""
+        try:
+            snapshot = load_snapshot(self.get_snapshot_path())
+        except Exception as e:
+            logger.exception(str(e))
+            snapshot = None
+        if snapshot is not None:
+            # with cascaded loops the user setpoint is the one of the outer loop
+            pid_state = snapshot['outer_pid'] if snapshot.get('outer_pid') is not None else snapshot['pid']
+            self.setpoint = [pid_state['setpoint'] for ind in range(self.model_class.Nsetpoint)]
+            self.command_pid.emit(ThreadCommand('restore_snapshot', [snapshot]))
+
+    def load_trajectory(self, trajectory):
+        """Upload a setpoint trajectory to the PID runner that will step through it within the loop
+
+        Parameters
+        ----------
+        trajectory: (SetpointTrajectory) the trajectory, its epsilon defaults to the one of the main settings
+        """
+        if trajectory.epsilon is None:
+            trajectory.epsilon = self.settings.child('main_settings', 'epsilon').value()
+        self.check_moving = False
+        self.command_pid.emit(ThreadCommand('load_trajectory', [trajectory]))
+
+    def scan_sequence(self, values, dwell_time, settle_time=0.):
+        """Step through a sequence of setpoints (from a DAQ_Scan for instance), each point being left once settled
+        and after dwell_time seconds"""
+        self.load_trajectory(SetpointTrajectory.from_sequence(values, dwell_time, settle_time=settle_time))
+
+    def process_trajectory(self, progress):
+        for sb in self.setpoints_sb:
+            sb.blockSignals(True)
+            sb.setValue(progress['setpoint'])
+            sb.blockSignals(False)
+        if progress['done']:
+            logger.info(f"Setpoint trajectory done: {progress['n_settled']}/{progress['n_points']} points settled")
+            self.move_done_signal.emit(self.title, progress['setpoint'])
+
     def process_output(self, datas):
         self.output_viewer.show_data([[dat] for dat in datas['output']])
         self.input_viewer.show_data([[dat] for dat in datas['input']])
@@ -166,6 +281,7 @@ class DAQ_PID(QObject):
         self.pause_action.setEnabled(enable)
 
     def setupUI(self):
+        from pymodaq_pid.lod import LODViewer  # deferred: only needed with a window
 
         self.dock_pid = gutils.Dock('PID controller', self.dock_area)
         self.dock_area.addDock(self.dock_pid)
@@ -241,13 +357,13 @@ class DAQ_PID(QObject):
 
         self.dock_output = gutils.Dock('PID output')
         widget_output = QtWidgets.QWidget()
-        self.output_viewer = Viewer0D(widget_output)
+        self.output_viewer = LODViewer(widget_output)
         self.dock_output.addWidget(widget_output)
         self.dock_area.addDock(self.dock_output, 'right')
 
         self.dock_input = gutils.Dock('PID input')
         widget_input = QtWidgets.QWidget()
-        self.input_viewer = Viewer0D(widget_input)
+        self.input_viewer = LODViewer(widget_input)
         self.dock_input.addWidget(widget_input)
         self.dock_area.addDock(self.dock_input, 'bottom', self.dock_output)
 
@@ -305,6 +421,8 @@ class DAQ_PID(QObject):
             --------
             custom_tree.XML_file_to_parameter, set_param_from_param, stop_moves, DAQ_Move_main.daq_move, DAQ_viewer_main.daq_viewer
         """
+        from pymodaq.daq_viewer.daq_viewer_main import DAQ_Viewer  # deferred: only needed when loading a preset
+        from pymodaq.daq_move.daq_move_main import DAQ_Move
 
         filename = os.path.join(get_set_pid_path(), model + '.xml')
         self.preset_file = filename
@@ -535,6 +653,7 @@ class DAQ_PID(QObject):
         """
         """
         try:
+            self.set_remote_server(False)
             try:
                 self.PIDThread.exit()
             except Exception as e:
@@ -578,9 +697,13 @@ class DAQ_PID(QObject):
                 if param.name() == 'model_class':
                     self.get_set_model_params(param.value())
 
-                elif param.name() == 'refresh_plot_time' or param.name() == 'timeout':
+                elif param.name() in ['refresh_plot_time', 'timeout', 'actuation_timeout']:
                     self.command_pid.emit(ThreadCommand('update_timer', [param.name(), param.value()]))
 
+                elif param.name() in ['overrun_policy', 'safe_output', 'parallel_actuation', 'wait_actuation',
+                                      'gain_scheduling']:
+                    self.command_pid.emit(ThreadCommand('update_options', {param.name(): param.value()}))
+
                 elif param.name() == 'sample_time':
                     self.command_pid.emit(ThreadCommand('update_options', dict(sample_time=param.value())))
 
@@ -608,6 +731,19 @@ class DAQ_PID(QObject):
                     Kd = self.settings.child('main_settings', 'pid_controls', 'pid_constants', 'kd').value()
                     self.command_pid.emit(ThreadCommand('update_options', dict(tunings=(Kp, Ki, Kd))))
 
+                elif param.name() in putils.iter_children(self.settings.child('telemetry'), []):
+                    self.command_pid.emit(ThreadCommand('update_telemetry', self.get_telemetry_options()))
+
+                elif param.name() in putils.iter_children(self.settings.child('profiling'), []):
+                    self.command_pid.emit(ThreadCommand('update_profiling', self.get_profiling_options()))
+
+                elif param.name() in putils.iter_children(self.settings.child('snapshots'), []):
+                    self.command_pid.emit(ThreadCommand('update_snapshot', self.get_snapshot_options()))
+
+                elif param.name() in putils.iter_children(self.settings.child('remote'), []):
+                    if self.Initialized_state and self.ini_PID_action.isChecked():
+                        self.set_remote_server()
+
                 elif param.name() in putils.iter_children(self.settings.child('models', 'model_params'), []):
                     self.model_class.update_settings(param)
 
@@ -622,14 +758,59 @@ class DAQ_PID(QObject):
         """
 
         """
-        pass
+        if status[0] == 'overrun':
+            overrun = status[1]
+            self.log_signal.emit(f"PID {overrun['stage']} overrun #{overrun['count']} ({overrun['policy']} policy)")
+            if overrun['paused'] and not self.pause_action.isChecked():
+                self.pause_action.setChecked(True)
+                for setp in self.setpoints_sb:
+                    setp.setEnabled(False)
+
+        elif status[0] == 'profile_done':
+            self.log_signal.emit(f"PID loop profile written to {', '.join(status[1])}")
+            self.settings.child('profiling', 'profiling_enabled').setValue(False)
+
+        elif status[0] == 'update_options':  # options applied from the remote control server
+            self.show_applied_options(status[1])
+
+    def show_applied_options(self, options):
+        """Mirror in the settings and the controls the options applied by the PID runner from another path than the
+        GUI (the remote control server), without sending them back to the runner"""
+        self.settings.sigTreeStateChanged.disconnect(self.parameter_tree_changed)
+        try:
+            pid_controls = self.settings.child('main_settings', 'pid_controls')
+            if 'setpoint' in options:
+                pid_controls.child('setpoint').setValue(options['setpoint'])
+                if hasattr(self, 'setpoints_sb'):
+                    for sb in self.setpoints_sb:
+                        sb.blockSignals(True)
+                        sb.setValue(options['setpoint'])
+                        sb.blockSignals(False)
+            if 'tunings' in options:
+                for key, value in zip(['kp', 'ki', 'kd'], options['tunings']):
+                    pid_controls.child('pid_constants', key).setValue(value)
+            if 'output_limits' in options:
+                for limit, value in zip(['min', 'max'], options['output_limits']):
+                    pid_controls.child('output_limits', f'output_limit_{limit}_enabled').setValue(value is not None)
+                    if value is not None:
+                        pid_controls.child('output_limits', f'output_limit_{limit}').setValue(value)
+            if 'sample_time' in options:
+                pid_controls.child('sample_time').setValue(int(round(options['sample_time'])))
+            if 'paused' in options and hasattr(self, 'pause_action'):
+                self.pause_action.setChecked(options['paused'])
+                for setp in self.setpoints_sb:
+                    setp.setEnabled(not options['paused'])
+        finally:
+            self.settings.sigTreeStateChanged.connect(self.parameter_tree_changed)
 
 
 class PIDRunner(QObject):
     status_sig = pyqtSignal(list)
     pid_output_signal = pyqtSignal(dict)
+    trajectory_signal = pyqtSignal(dict)
+    _wake_signal = pyqtSignal()
 
-    def __init__(self, model_class, module_manager, params=dict([])):
+    def __init__(self, model_class, module_manager, params=dict([]), clock=None):
         """
         Init the PID instance with params as initial conditions
 
@@ -638,34 +819,94 @@ class PIDRunner(QObject):
         params: (dict) Kp=1.0, Ki=0.0, Kd=0.0,setpoint=0, sample_time=0.01, output_limits=(None, None),
                  auto_mode=True,
                  proportional_on_measurement=False)
+        clock: (RealClock or VirtualClock) clock of the loop, a VirtualClock makes it run as fast as possible and
+            deterministically (for simulations), defaults to a RealClock
         """
         super().__init__()
+        from simple_pid import PID  # deferred: only needed once the PID is initialized
+
         self.model_class = model_class
         self.module_manager = module_manager
+        self.clock = RealClock() if clock is None else clock
 
         self.current_time = 0
         self.input = 0
         self.output = None
         self.output_to_actuator = None
         self.output_limits = None, None
-        self.pid = PID(**params)  # #PID(object):
+        try:
+            self.pid = PID(time_fn=self.clock.now, **params)  # #PID(object):
+        except TypeError:  # simple_pid versions without the time_fn argument
+            self.pid = PID(**params)
         self.pid.set_auto_mode(False)
+        self.outer_loop = None
+        if getattr(model_class, 'cascade', None) is not None:
+            from pymodaq_pid.cascade import OuterLoop
+            self.outer_loop = OuterLoop.from_model(model_class, self.pid.setpoint)
+        self.gain_schedule = None
+        if getattr(model_class, 'gain_schedule', None) is not None:
+            self.gain_schedule = GainSchedule.from_model(model_class)
+        self.gain_scheduling = True
+        self.manual_tunings = self.pid.tunings  # the PID constants of the settings, used without gain scheduling
         self.refreshing_ouput_time = 200
         self.running = True
         self.timer = self.startTimer(self.refreshing_ouput_time)
+        self.telemetry = None
+        self.loop_period = 0.
+        self.acquisition_time = None
+        self.sample_dt = None
+        self._pid_acquisition_time = None
+        self._acquisition_stamped = True  # the last acquisition time was given by the detectors
+        self.acquisition = None  # subscription to the acquisition broker shared with the other loops
+
+        self.loop_active = False
+        self._pending_commands = queue.Queue()
+        self._command_event = threading.Event()
+        self._wake_signal.connect(self.process_pending_commands)
 
         self.paused = True
 
-    #     self.timeout_timer = QtCore.QTimer()
-    #     self.timeout_timer.setInterval(10000)
-    #     self.timeout_scan_flag = False
-    #     self.timeout_timer.timeout.connect(self.timeout)
-    #
+        # no deadline for simulations where stages are called in the loop thread to stay deterministic
+        self.acquisition_deadline = StageDeadline('acquisition', None if self.clock.simulated else 10.)
+        self.actuation_deadline = StageDeadline('actuation', None if self.clock.simulated else 10.)
+        self.overrun_policy = 'hold'
+        self.safe_output = 0.
+        self.parallel_actuation = True
+        self.wait_actuation = False
+        self.dispatcher = None
+        self._actuation_times = dict([])
+        self.profiler = None
+
+        self.trajectory = None
+
+        self.snapshot_path = None
+        self.snapshot_period = 10.
+        self._last_snapshot_time = 0.
+        self._restored_pid_state = None
+        self._restored_outer_state = None
+
     def timerEvent(self, event):
         if self.output_to_actuator is not None:
-            self.pid_output_signal.emit(dict(output=self.output_to_actuator.values, input=[self.input]))
+            self.pid_output_signal.emit(dict(output=self.output_to_actuator.values, input=[self.process_value]))
+        else:
+            self.pid_output_signal.emit(dict(output=[0], input=[self.process_value]))
+
+    @property
+    def setpoint(self):
+        """The user setpoint: the one of the outer loop for cascaded loops"""
+        return self.pid.setpoint if self.outer_loop is None else self.outer_loop.pid.setpoint
+
+    @setpoint.setter
+    def setpoint(self, value):
+        if self.outer_loop is None:
+            self.pid.setpoint = value
         else:
-            self.pid_output_signal.emit(dict(output=[0], input=[self.input]))
+            self.outer_loop.pid.setpoint = value
+
+    @property
+    def process_value(self):
+        """The measurement compared to the user setpoint: the input of the outer loop for cascaded loops"""
+        return self.input if self.outer_loop is None else self.outer_loop.input
 
     @pyqtSlot(ThreadCommand)
     def queue_command(self, command=ThreadCommand()):
@@ -686,6 +927,24 @@ class PIDRunner(QObject):
         elif command.command == 'update_options':
             self.set_option(**command.attributes)
 
+        elif command.command == 'load_trajectory':
+            self.load_trajectory(*command.attributes)
+
+        elif command.command == 'stop_trajectory':
+            self.load_trajectory(None)
+
+        elif command.command == 'update_snapshot':
+            self.set_snapshot_options(**command.attributes)
+
+        elif command.command == 'restore_snapshot':
+            self.restore_snapshot(*command.attributes)
+
+        elif command.command == 'update_profiling':
+            self.set_profiling(**command.attributes)
+
+        elif command.command == 'update_telemetry':
+            self.set_telemetry(**command.attributes)
+
         elif command.command == 'input':
             self.update_input(*command.attributes)
 
@@ -694,13 +953,191 @@ class PIDRunner(QObject):
                 self.killTimer(self.timer)
                 self.refreshing_ouput_time = command.attributes[1]
                 self.timer = self.startTimer(self.refreshing_ouput_time)
+            elif self.clock.simulated:
+                pass
             elif command.attributes[0] == 'timeout':
-                self.timeout_timer.setInterval(command.attributes[1])
+                self.acquisition_deadline.timeout = command.attributes[1] / 1000
+            elif command.attributes[0] == 'actuation_timeout':
+                self.actuation_deadline.timeout = command.attributes[1] / 1000
+
+    def submit_command(self, command=None):
+        """Thread safe entry point to the command path, bypassing the GUI
+
+        Parameters
+        ----------
+        command: (ThreadCommand) same commands as queue_command (apart from start_PID), None to only read the state
+
+        Returns
+        -------
+        Future: resolved with the runner state (dict) once the command has been applied by the loop
+        """
+        future = Future()
+        self._pending_commands.put((command, future))
+        self._command_event.set()
+        if not self.loop_active:
+            self._wake_signal.emit()
+        return future
+
+    @pyqtSlot()
+    def process_pending_commands(self):
+        while True:
+            try:
+                command, future = self._pending_commands.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                if command is not None:
+                    if command.command == 'start_PID':
+                        raise ValueError('start_PID cannot be submitted remotely')
+                    self.queue_command(command)
+                    if command.command == 'update_options':
+                        self.status_sig.emit(['update_options', command.attributes])
+                    elif command.command in ['pause_PID', 'run_PID']:
+                        self.status_sig.emit(['update_options', dict(paused=self.paused)])
+                future.set_result(self.get_state())
+            except Exception as e:
+                future.set_exception(e)
+
+    def get_state(self):
+        return dict(setpoint=self.setpoint, input=float(self.process_value),
+                    output=None if self.output is None else float(self.output),
+                    tunings=list(self.pid.tunings), output_limits=list(self.pid.output_limits),
+                    sample_time=self.pid.sample_time, paused=self.paused, auto_mode=self.pid.auto_mode,
+                    running=self.loop_active, loop_period=self.loop_period, overruns=self.overruns,
+                    actuation_times=self.actuation_times)
+
+    @property
+    def actuation_times(self):
+        """Time in seconds taken by the last command of each actuator"""
+        if self.dispatcher is not None:
+            self._actuation_times = dict(self.dispatcher.timings)
+        return self._actuation_times
+
+    @property
+    def overruns(self):
+        return dict(acquisition=self.acquisition_deadline.overruns, actuation=self.actuation_deadline.overruns)
+
+    def handle_overrun(self, overrun):
+        """Apply the overrun policy after a loop stage missed its deadline
+
+        hold: the last output is kept (no new command is sent to the actuators)
+        pause: the stabilization is paused
+        safe: the safe output is sent (in absolute mode) to the actuators and the stabilization is paused
+        """
+        # a hung stage refuses every following call: only the overrun starting the episode is reported and handled
+        report = not overrun.still_running
+        if report:
+            logger.warning(str(overrun))
+        if self.overrun_policy == 'safe' and report:
+            try:
+                self.actuation_deadline.run(self.move_actuators,
+                                            [self.safe_output for _ in self.model_class.actuators_name], 'abs')
+            except StageOverrun as e:
+                logger.error(f'Safe output could not be applied: {str(e)}')
+        if self.overrun_policy in ['pause', 'safe'] and not self.paused:
+            self.pause_PID(True)
+        if report:
+            self.status_sig.emit(['overrun', dict(stage=overrun.stage, count=self.overruns[overrun.stage],
+                                              policy=self.overrun_policy, still_running=overrun.still_running,
+                                              paused=self.paused)])
+
+    def wait_next_sample(self, duration):
+        """Sleep until the next sample while applying submitted commands as soon as they arrive"""
+        deadline = self.clock.now() + duration
+        remaining = duration
+        while remaining > 0:
+            if self.clock.sleep(remaining, self._command_event):
+                self._command_event.clear()
+                self.process_pending_commands()
+            remaining = deadline - self.clock.now()
+
+    def acquire(self):
+        """Acquisition stage of the loop: grab the detectors data and keep only what the model needs
+
+        Returns
+        -------
+        (OrderedDict, float, bool): the reduced data, their acquisition time in the time base of the runner clock and
+            True if this time was given by the detectors (acq_time_s) or False if it is the time the data were
+            grabbed (possibly by another loop sharing the detectors)
+        """
+        if self.acquisition is not None:
+            # frames are reused from the other loops only if acquired within the last sample time
+            datas = self.acquisition.grab(max_age=None if self.clock.simulated else self.pid.sample_time)
+            grab_time = self.acquisition.frame_time
+        else:
+            datas = self.module_manager.grab_datas()
+            grab_time = self.clock.now()
+        stamp = get_acquisition_time(datas)
+        if stamp is None:
+            return self.model_class.reduce_measurements(datas), grab_time, False
+        return self.model_class.reduce_measurements(datas), self.clock.from_epoch(stamp), True
+
+    def set_acquisition_time(self, acquisition_time, stamped=True):
+        """Update the sample spacing from the acquisition time of the new data and pass both to the model
+
+        Parameters
+        ----------
+        acquisition_time: (float) acquisition time of the data in the time base of the runner clock
+        stamped: (bool) True if given by the detectors, False if it is the time the data were grabbed
+        """
+        if stamped != self._acquisition_stamped:
+            # the detectors started or stopped stamping their data: no sample spacing across the two time sources
+            self.acquisition_time = None
+            self._pid_acquisition_time = None
+            self._acquisition_stamped = stamped
+        if self.acquisition_time is not None and acquisition_time > self.acquisition_time:
+            self.sample_dt = acquisition_time - self.acquisition_time
+        else:
+            self.sample_dt = None
+        self.acquisition_time = acquisition_time
+        self.model_class.acquisition_time = acquisition_time
+        self.model_class.sample_dt = self.sample_dt
+
+    def execute_pid(self):
+        """Execute the PID with the time elapsed between the acquisitions of its last computed sample and of the current
+        one, rather than the time between calls"""
+        dt = None
+        if self._pid_acquisition_time is not None and self.acquisition_time > self._pid_acquisition_time:
+            dt = self.acquisition_time - self._pid_acquisition_time
+            if self.clock.simulated:
+                dt = round(dt, 9)  # virtual times are exact but for float rounding errors that would skip samples
+        output = self.pid(self.input, dt=dt)
+        if dt is None or self.pid.sample_time is None or dt >= self.pid.sample_time:
+            # otherwise simple_pid skipped this sample and the next dt has to span from the last computed one
+            self._pid_acquisition_time = self.acquisition_time
+        return output
+
+    def move_actuators(self, values, mode='abs'):
+        """Actuation stage of the loop: dispatch the values to the actuators, concurrently for actuators on distinct
+        controllers if parallel_actuation is set"""
+        if self.dispatcher is None:
+            self.dispatcher = ActuatorDispatcher(self.module_manager, self.module_manager.selected_actuators_name,
+                                                 wait=self.wait_actuation)
+        if self.parallel_actuation:
+            self.dispatcher.move(values, mode)
+        else:
+            self.module_manager.move_actuators(values, mode, poll=self.wait_actuation)
+
+    def close_acquisition(self):
+        if self.acquisition is not None:
+            self.acquisition.close()
+            self.acquisition = None
+
+    def close_dispatcher(self):
+        if self.dispatcher is not None:
+            self._actuation_times = dict(self.dispatcher.timings)
+            self.dispatcher.close()
+            self.dispatcher = None
+
+    def close_deadlines(self):
+        """Stop the stage workers, they are started again by the next call with a timeout"""
+        self.acquisition_deadline.close()
+        self.actuation_deadline.close()
 
     def update_input(self, measurements):
         self.input = self.model_class.convert_input(measurements)
 
-    def start_PID(self, sync_detectors=True, sync_acts=False):
+    def start_PID(self, sync_detectors=True, sync_acts=False, duration=None):
         """Start the pid controller loop
 
         Parameters
@@ -709,6 +1146,7 @@ class PIDRunner(QObject):
             the model
         sync_acts: (bool) if True will make sure all selected actuators (if any) all reached their target position
          before calling the model
+        duration: (float) if not None, the loop exits after this duration in seconds (as given by the runner clock)
         """
         self.running = True
         try:
@@ -717,45 +1155,238 @@ class PIDRunner(QObject):
             if sync_acts:
                 self.module_manager.connect_actuators()
 
-            self.current_time = time.perf_counter()
+            self.current_time = self.clock.now()
+            loop_start = self.current_time
+            self.acquisition_time = None  # no sample spacing across two runs of the loop
+            self._pid_acquisition_time = None
+            self.acquisition = AcquisitionBroker.subscribe(self.module_manager, self.clock)
+            stop_time = None if duration is None else loop_start + duration
             logger.info('PID loop starting')
+            self.loop_active = True
             while self.running:
-                # print('input: {}'.format(self.input))
+                self.process_pending_commands()
+                now = self.clock.now()
+                if stop_time is not None and now >= stop_time:
+                    break
+                profiler = self.profiler
+                if profiler is not None:
+                    profiler.enable()
+                self.loop_period = now - loop_start
+                loop_start = now
                 # # GRAB DATA FIRST AND WAIT ALL DETECTORS RETURNED
+                try:
+                    self.det_done_datas, acquisition_time, stamped = self.acquisition_deadline.run(self.acquire)
+                except StageOverrun as overrun:
+                    self.handle_overrun(overrun)
+                else:
+                    self.set_acquisition_time(acquisition_time, stamped)
+                    self.input = self.model_class.convert_input(self.det_done_datas)
 
-                self.det_done_datas = self.module_manager.grab_datas()
+                    if self.outer_loop is not None and self.outer_loop.due(self.clock.now()):
+                        self.step_outer_loop()
 
-                self.input = self.model_class.convert_input(self.det_done_datas)
+                    if self.trajectory is not None:
+                        self.step_trajectory()
 
-                # # EXECUTE THE PID
-                self.output = self.pid(self.input)
+                    if self.gain_schedule is not None and self.gain_scheduling:
+                        self.schedule_gains()
 
-                # # APPLY THE PID OUTPUT TO THE ACTUATORS
-                if self.output is None:
-                    self.output = self.pid.setpoint
+                    # # EXECUTE THE PID
+                    self.output = self.execute_pid()
 
-                dt = time.perf_counter() - self.current_time
-                self.output_to_actuator = self.model_class.convert_output(self.output, dt, stab=True)
+                    # # APPLY THE PID OUTPUT TO THE ACTUATORS
+                    if self.output is None:
+                        self.output = self.pid.setpoint
 
-                if not self.paused:
-                    self.module_manager.move_actuators(self.output_to_actuator.values,
-                                                       self.output_to_actuator.mode,
-                                                       poll=False)
+                    dt = self.sample_dt if self.sample_dt is not None else self.clock.now() - self.current_time
+                    self.output_to_actuator = self.model_class.convert_output(self.output, dt, stab=True)
 
-                self.current_time = time.perf_counter()
-                QtWidgets.QApplication.processEvents()
-                QThread.msleep(int(self.pid.sample_time * 1000))
+                    if not self.paused:
+                        try:
+                            self.actuation_deadline.run(self.move_actuators, self.output_to_actuator.values,
+                                                        self.output_to_actuator.mode)
+                        except StageOverrun as overrun:
+                            self.handle_overrun(overrun)
+
+                    if self.telemetry is not None:
+                        self.publish_telemetry()
 
+                if self.snapshot_path is not None and \
+                        self.clock.now() - self._last_snapshot_time >= self.snapshot_period:
+                    self.save_snapshot()
+
+                self.current_time = self.clock.now()
+                if not self.clock.simulated:
+                    QtWidgets.QApplication.processEvents()
+                if profiler is not None and profiler.disable() and profiler is self.profiler:
+                    self.stop_profiling()
+                self.wait_next_sample(self.pid.sample_time)
+
+            self.loop_active = False
+            self.process_pending_commands()
+            if self.snapshot_path is not None:
+                self.save_snapshot()
             logger.info('PID loop exiting')
+            self.stop_profiling()
+            self.close_dispatcher()
+            self.close_acquisition()
+            self.close_deadlines()
             self.module_manager.connect_actuators(False)
             self.module_manager.connect_detectors(False)
 
         except Exception as e:
+            self.loop_active = False
+            self.close_acquisition()
+            self.close_deadlines()
             logger.exception(str(e))
 
+    def load_trajectory(self, trajectory=None):
+        """Set the trajectory the loop will step through, its first point is applied on the next iteration
+
+        Parameters
+        ----------
+        trajectory: (SetpointTrajectory) the trajectory or None to stop following the current one
+        """
+        if trajectory is not None:
+            trajectory.reset()
+            logger.info(f'Setpoint trajectory of {len(trajectory)} points loaded')
+        elif self.trajectory is not None:
+            logger.info('Setpoint trajectory stopped')
+        self.trajectory = trajectory
+
+    def step_trajectory(self):
+        try:
+            updated = self.trajectory.update(self.clock.now(), self.process_value)
+        except Exception as e:  # a faulty trajectory is dropped, it should not stop the loop
+            logger.exception(f'Setpoint trajectory stopped: {str(e)}')
+            self.trajectory = None
+            return
+        if updated:
+            self.setpoint = float(self.trajectory.setpoint)
+            self.trajectory_signal.emit(self.trajectory.progress)
+            if self.trajectory.done:
+                self.trajectory = None
+
+    def set_profiling(self, enabled=False, iterations=1000, path=''):
+        """Start or stop the profiling of the loop
+
+        Parameters
+        ----------
+        enabled: (bool) start a profile if True, stop the current one (writing what was sampled) if False
+        iterations: (int) number of loop iterations to sample
+        path: (str) folder where the statistics files are written
+        """
+        if enabled and self.profiler is None:
+            self.profiler = LoopProfiler(self, iterations, path)
+            self.profiler.start()
+            logger.info(f'Profiling {iterations} iterations of the PID loop')
+        elif not enabled:
+            self.stop_profiling()
+
+    def stop_profiling(self):
+        if self.profiler is not None:
+            profiler = self.profiler
+            self.profiler = None
+            try:
+                paths = profiler.stop()
+            except Exception as e:
+                logger.exception(str(e))
+            else:
+                logger.info(f"PID loop profile written to {', '.join(paths)}")
+                self.status_sig.emit(['profile_done', paths])
+
+    def set_snapshot_options(self, path=None, period=10.):
+        """
+        Parameters
+        ----------
+        path: (str) json file where snapshots are periodically saved, None to disable them
+        period: (float) time in seconds between two snapshots
+        """
+        self.snapshot_path = path
+        self.snapshot_period = period
+
+    def take_snapshot(self):
+        """Get the state of the runner, of its PID and of its model as a json serializable dict"""
+        output_to_actuator = None
+        if self.output_to_actuator is not None:
+            output_to_actuator = dict(mode=self.output_to_actuator.mode, values=list(self.output_to_actuator.values))
+        return dict(version=SNAPSHOT_VERSION, time=time.time(), model=type(self.model_class).__name__,
+                    pid=get_pid_state(self.pid), input=self.input, output=self.output,
+                    outer_pid=None if self.outer_loop is None else get_pid_state(self.outer_loop.pid),
+                    output_to_actuator=output_to_actuator, model_state=self.model_class.get_state())
+
+    def save_snapshot(self):
+        self._last_snapshot_time = self.clock.now()
+        try:
+            save_snapshot(self.take_snapshot(), self.snapshot_path)
+        except Exception as e:
+            logger.exception(f'Could not save the PID snapshot: {str(e)}')
+
+    def restore_snapshot(self, snapshot):
+        """Restore a snapshot taken by take_snapshot, the PID internals are applied again when the stabilization
+        starts so that it resumes from the saved integral term and output"""
+        if snapshot['model'] != type(self.model_class).__name__:
+            logger.warning(f"The snapshot was taken with the model {snapshot['model']}, it is not restored")
+            return
+        set_pid_state(self.pid, snapshot['pid'])
+        self.input = snapshot['input']
+        self.output = snapshot['output']
+        if snapshot['output_to_actuator'] is not None:
+            self.output_to_actuator = OutputToActuator(**snapshot['output_to_actuator'])
+        self.model_class.set_state(snapshot['model_state'])
+        self._restored_pid_state = snapshot['pid']
+        if self.outer_loop is not None and snapshot.get('outer_pid') is not None:
+            set_pid_state(self.outer_loop.pid, snapshot['outer_pid'])
+            self.outer_loop.output = snapshot['outer_pid']['last_output']
+            self._restored_outer_state = snapshot['outer_pid']
+        logger.info(f"PID state restored from a snapshot taken at "
+                    f"{datetime.datetime.fromtimestamp(snapshot['time']).isoformat()}")
+
+    def step_outer_loop(self):
+        """Execute the outer loop of cascaded loops, its output becoming the setpoint of the inner one"""
+        inner_setpoint = self.outer_loop.step(self.clock.now(),
+                                              self.model_class.convert_outer_input(self.det_done_datas))
+        if inner_setpoint is not None:
+            self.pid.setpoint = inner_setpoint
+
+    def set_telemetry(self, enabled=False, address=('127.0.0.1', 6342), queue_size=100):
+        """(Re)start or stop the telemetry publisher
+
+        Parameters
+        ----------
+        enabled: (bool) if True start a publisher on the given address
+        address: (str or tuple) (host, port) for a TCP socket or path of a Unix socket
+        queue_size: (int) number of frames buffered per subscriber
+        """
+        if self.telemetry is not None:
+            self.telemetry.stop()
+            self.telemetry = None
+        if enabled:
+            try:
+                # the frames hold the user setpoint and process value of the loop, see publish_telemetry
+                telemetry = TelemetryPublisher(address, n_setpoints=1,
+                                               n_outputs=max(1, len(self.model_class.actuators_name)),
+                                               queue_size=queue_size)
+                telemetry.start()
+                self.telemetry = telemetry
+            except Exception as e:
+                logger.exception(str(e))
+
+    def publish_telemetry(self):
+        flags = FLAG_PAUSED if self.paused else 0
+        output_min, output_max = self.pid.output_limits
+        if output_min is not None and self.output <= output_min:
+            flags |= FLAG_SATURATED_MIN
+        if output_max is not None and self.output >= output_max:
+            flags |= FLAG_SATURATED_MAX
+        self.telemetry.publish([self.setpoint], [self.process_value], self.output_to_actuator.values,
+                               self.loop_period, flags)
+
     def set_option(self, **option):
         for key in option:
-            if hasattr(self.pid, key):
+            if key == 'setpoint':
+                self.setpoint = option[key]
+            elif hasattr(self.pid, key):
                 if key == 'sample_time':
                     setattr(self.pid, key, option[key] / 1000)
                 else:
@@ -763,17 +1394,59 @@ class PIDRunner(QObject):
 
             if key == 'output_limits':
                 self.output_limits = option[key]
-
-    def run_PID(self, last_value):
+            elif key == 'overrun_policy':
+                self.overrun_policy = option[key]
+            elif key == 'safe_output':
+                self.safe_output = option[key]
+            elif key == 'tunings':
+                self.manual_tunings = tuple(option[key])
+            elif key == 'gain_scheduling':
+                self.gain_scheduling = option[key]
+                if not option[key]:
+                    self.pid.tunings = self.manual_tunings
+            elif key == 'parallel_actuation':
+                self.parallel_actuation = option[key]
+            elif key == 'wait_actuation':
+                self.wait_actuation = option[key]
+                if self.dispatcher is not None:
+                    self.dispatcher.set_wait(option[key])
+
+    def schedule_gains(self):
+        """Set the PID gains interpolated from the gain schedule of the model at the current setpoint or measurement"""
+        value = self.pid.setpoint if self.gain_schedule.index == 'setpoint' else self.input
+        self.pid.Kp, self.pid.Ki, self.pid.Kd = self.gain_schedule(value)
+
+    def run_PID(self, last_value=None):
+        if last_value is None:
+            last_value = self.output
         logger.info('Stabilization started')
         self.pid.set_auto_mode(True, last_value)
+        if self.outer_loop is not None:
+            # bumpless: the outer loop starts from the current measurement of the inner loop
+            self.outer_loop.set_auto_mode(True, self.input)
+        self.apply_restored_state()
+
+    def apply_restored_state(self):
+        """Apply again the restored PID internals, reset when the PIDs are switched to auto mode"""
+        if self._restored_pid_state is not None:
+            set_pid_state(self.pid, self._restored_pid_state)
+            self._restored_pid_state = None
+        if self._restored_outer_state is not None:
+            if self.outer_loop is not None:
+                set_pid_state(self.outer_loop.pid, self._restored_outer_state)
+            self._restored_outer_state = None
 
     def pause_PID(self, pause_state):
         if pause_state:
             self.pid.set_auto_mode(False)
+            if self.outer_loop is not None:
+                self.outer_loop.set_auto_mode(False)
             logger.info('Stabilization paused')
         else:
             self.pid.set_auto_mode(True, self.output)
+            if self.outer_loop is not None:
+                self.outer_loop.set_auto_mode(True, self.pid.setpoint)
+            self.apply_restored_state()
             logger.info('Stabilization restarted from pause')
         self.paused = pause_state
 
@@ -36,7 +36,20 @@ params = [
     # here only to be compatible with DAQ_Scan, the model could update it
 
     {'title': 'Main Settings:', 'name': 'main_settings', 'expanded': True, 'type': 'group', 'children': [
-        {'title': 'Acquisition Timeout (ms):', 'name': 'timeout', 'type': 'int', 'value': 10000},
+        {'title': 'Acquisition Timeout (ms):', 'name': 'timeout', 'type': 'int', 'value': 10000,
+         'tooltip': 'Deadline of the detectors acquisition, 0 to wait forever'},
+        {'title': 'Actuation Timeout (ms):', 'name': 'actuation_timeout', 'type': 'int', 'value': 10000,
+         'tooltip': 'Deadline of the commands sent to the actuators, 0 to wait forever'},
+        {'title': 'Overrun policy:', 'name': 'overrun_policy', 'type': 'list', 'values': ['hold', 'pause', 'safe'],
+         'tooltip': 'On a missed deadline: hold the last output, pause the stabilization or send the safe output'
+                    ' then pause'},
+        {'title': 'Safe output:', 'name': 'safe_output', 'type': 'float', 'value': 0.,
+         'tooltip': 'Absolute value sent to the actuators by the safe overrun policy'},
+        {'title': 'Parallel actuation:', 'name': 'parallel_actuation', 'type': 'bool', 'value': True,
+         'tooltip': 'Command concurrently the actuators on distinct controllers, one after the other (on their move '
+                    'done) the ones sharing a controller'},
+        {'title': 'Wait actuation:', 'name': 'wait_actuation', 'type': 'bool', 'value': False,
+         'tooltip': 'Wait for all actuators to reach their target before the next loop iteration'},
         {'title': 'epsilon', 'name': 'epsilon', 'type': 'float', 'value': 0.01,
          'tooltip': 'Precision at which move is considered as done'},
         {'title': 'PID controls:', 'name': 'pid_controls', 'type': 'group', 'children': [
@@ -60,8 +73,44 @@ params = [
                 {'title': 'Ki:', 'name': 'ki', 'type': 'float', 'value': 0.01, 'min': 0},
                 {'title': 'Kd:', 'name': 'kd', 'type': 'float', 'value': 0.001, 'min': 0},
             ]},
+            {'title': 'Gain scheduling:', 'name': 'gain_scheduling', 'type': 'bool', 'value': True,
+             'tooltip': 'Use the gain schedule of the model (if it has one) instead of the PID constants'},
 
         ]},
 
     ]},
+    {'title': 'Snapshots:', 'name': 'snapshots', 'expanded': False, 'type': 'group', 'children': [
+        {'title': 'Save snapshots:', 'name': 'snapshot_enabled', 'type': 'bool', 'value': False,
+         'tooltip': 'Periodically (and on stop) save the PID and model state for warm restarts'},
+        {'title': 'Period (s):', 'name': 'snapshot_period', 'type': 'float', 'value': 10., 'min': 0.},
+        {'title': 'Restore on init:', 'name': 'snapshot_restore', 'type': 'bool', 'value': True,
+         'tooltip': 'Resume from the last saved snapshot when the PID is initialized'},
+        {'title': 'File:', 'name': 'snapshot_path', 'type': 'str', 'value': '',
+         'tooltip': 'json file of the snapshots, defaults to <model>_snapshot.json in the pid configuration folder'},
+    ]},
+    {'title': 'Profiling:', 'name': 'profiling', 'expanded': False, 'type': 'group', 'children': [
+        {'title': 'Profile loop:', 'name': 'profiling_enabled', 'type': 'bool', 'value': False,
+         'tooltip': 'Profile the next iterations of the PID loop (cProfile and stage timings)'},
+        {'title': 'Iterations:', 'name': 'profile_iterations', 'type': 'int', 'value': 1000, 'min': 1},
+        {'title': 'Folder:', 'name': 'profile_path', 'type': 'str', 'value': '',
+         'tooltip': 'Folder of the statistics files, defaults to profiles in the pid configuration folder'},
+    ]},
+    {'title': 'Telemetry:', 'name': 'telemetry', 'expanded': False, 'type': 'group', 'children': [
+        {'title': 'Publish telemetry:', 'name': 'telemetry_enabled', 'type': 'bool', 'value': False,
+         'tooltip': 'Stream binary frames of the loop state to local subscribers'},
+        {'title': 'Socket type:', 'name': 'telemetry_socket', 'type': 'list', 'values': ['tcp', 'unix']},
+        {'title': 'Port:', 'name': 'telemetry_port', 'type': 'int', 'value': 6342,
+         'tooltip': 'Port of the local TCP socket (bound on 127.0.0.1)'},
+        {'title': 'Unix socket path:', 'name': 'telemetry_path', 'type': 'str', 'value': '/tmp/pymodaq_pid.sock'},
+        {'title': 'Queue size:', 'name': 'telemetry_queue', 'type': 'int', 'value': 100, 'min': 1,
+         'tooltip': 'Frames buffered per subscriber, oldest ones are dropped for slow subscribers'},
+    ]},
+    {'title': 'Remote control:', 'name': 'remote', 'expanded': False, 'type': 'group', 'children': [
+        {'title': 'Enable server:', 'name': 'remote_enabled', 'type': 'bool', 'value': False,
+         'tooltip': 'Accept JSON requests (setpoint, gains, pause/run, limits) applied directly by the PID loop'},
+        {'title': 'Socket type:', 'name': 'remote_socket', 'type': 'list', 'values': ['tcp', 'unix']},
+        {'title': 'Port:', 'name': 'remote_port', 'type': 'int', 'value': 6343,
+         'tooltip': 'Port of the local TCP socket (bound on 127.0.0.1)'},
+        {'title': 'Unix socket path:', 'name': 'remote_path', 'type': 'str', 'value': '/tmp/pymodaq_pid_remote.sock'},
+    ]},
 ]
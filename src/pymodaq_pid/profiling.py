@@ -0,0 +1,132 @@
+"""
+Opt-in profiling of the PID loop.
+
+A LoopProfiler samples a given number of loop iterations: cProfile is enabled in the loop thread only, around each
+iteration, and the model methods, the PID step and the modules manager calls are timed when called from the loop
+thread or from its deadline workers (where the acquisition and actuation stages may run): calls from other loops
+sharing the same modules manager are not recorded. Once the iterations are sampled, it writes:
+
+* <name>.prof: the cProfile statistics, to be read with pstats or snakeviz
+* <name>.txt: the timings of the loop stages followed by the most expensive functions
+
+Nothing is wrapped nor enabled while no profiler is active.
+"""
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+import numpy as np
+
+# (owner attribute of the runner, method, stage) timed during a profile, None standing for the runner itself
+PROFILED_METHODS = [('model_class', 'convert_input', 'convert_input'),
+                    ('model_class', 'convert_output', 'convert_output'),
+                    (None, 'execute_pid', 'pid'),
+                    (None, 'acquire', 'acquisition'),
+                    ('module_manager', 'grab_datas', 'grab_datas'),
+                    (None, 'move_actuators', 'actuation'),
+                    ('module_manager', 'move_actuators', 'move_actuators')]
+
+
+class LoopProfiler:
+    """Profile a number of iterations of a PIDRunner loop
+
+    Parameters
+    ----------
+    runner: (PIDRunner) the profiled runner
+    iterations: (int) number of loop iterations to sample
+    path: (str) folder where the statistics files are written
+    """
+
+    def __init__(self, runner, iterations=1000, path=''):
+        self.runner = runner
+        self.iterations = iterations
+        self.path = path
+        self.count = 0
+        self.timings = OrderedDict([(stage, []) for owner, method, stage in PROFILED_METHODS])
+        self._profile = cProfile.Profile()
+        self._wrapped = []
+        self._thread = None
+
+    def start(self):
+        """Wrap the timed methods, to be called from the loop thread"""
+        self._thread = threading.get_ident()
+        for owner_name, method, stage in PROFILED_METHODS:
+            owner = self.runner if owner_name is None else getattr(self.runner, owner_name)
+            if not hasattr(owner, method):
+                continue
+            previous = owner.__dict__.get(method, None)  # an instance attribute shadowing the class method
+            setattr(owner, method, self._timed(getattr(owner, method), self.timings[stage]))
+            self._wrapped.append((owner, method, previous))
+
+    def in_loop(self):
+        """True if called from the loop thread or from one of the runner stage workers"""
+        ident = threading.get_ident()
+        return ident == self._thread or \
+            ident in (self.runner.acquisition_deadline.worker_ident, self.runner.actuation_deadline.worker_ident)
+
+    def _timed(self, fun, timings):
+        def timed(*args, **kwargs):
+            if not self.in_loop():
+                return fun(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fun(*args, **kwargs)
+            finally:
+                timings.append(time.perf_counter() - start)
+        return timed
+
+    def enable(self):
+        if threading.get_ident() == self._thread:
+            self._profile.enable()
+
+    def disable(self):
+        """Close the sampling of an iteration
+
+        Returns
+        -------
+        bool: True once all iterations have been sampled
+        """
+        self._profile.disable()
+        self.count += 1
+        return self.count >= self.iterations
+
+    def stop(self):
+        """Restore the timed methods and write the statistics files
+
+        Returns
+        -------
+        list of str: the paths of the written files
+        """
+        self._profile.disable()
+        for owner, method, previous in self._wrapped:
+            if previous is None:
+                delattr(owner, method)
+            else:
+                setattr(owner, method, previous)
+        self._wrapped = []
+
+        if self.count == 0:
+            return []
+        os.makedirs(self.path, exist_ok=True)
+        name = os.path.join(self.path, f"pid_profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+        self._profile.dump_stats(f'{name}.prof')
+        with open(f'{name}.txt', 'w') as f:
+            f.write(self.report())
+        return [f'{name}.prof', f'{name}.txt']
+
+    def report(self, nfunctions=30):
+        lines = [f'PID loop profile of {self.count} iterations', '',
+                 f"{'stage':<16}{'calls':>8}{'total (s)':>12}{'mean (ms)':>12}{'p99 (ms)':>12}{'max (ms)':>12}"]
+        for stage, timings in self.timings.items():
+            if len(timings) != 0:
+                timings = np.array(timings)
+                lines.append(f'{stage:<16}{len(timings):>8}{timings.sum():>12.4f}{timings.mean() * 1e3:>12.4f}'
+                             f'{np.percentile(timings, 99) * 1e3:>12.4f}{timings.max() * 1e3:>12.4f}')
+        stream = io.StringIO()
+        pstats.Stats(self._profile, stream=stream).sort_stats('cumulative').print_stats(nfunctions)
+        return '\n'.join(lines) + '\n\n' + stream.getvalue()
@@ -0,0 +1,169 @@
+"""
+Request/response server giving remote programs a low-latency access to the PID runner command path.
+
+The protocol is line based JSON over a local TCP or Unix socket, one request per line:
+
+    {"id": 1, "op": "setpoint", "value": 1.5}
+
+and one reply per request, sent once the PID loop has applied the operation:
+
+    {"id": 1, "ok": true, "state": {"setpoint": 1.5, "input": ..., "output": ..., "paused": false, ...}}
+
+Available operations: setpoint, tunings ([kp, ki, kd]), output_limits ([min, max], null for no limit),
+sample_time (ms), pause (bool), run (resume the stabilization, same as pause false) and state.
+"""
+import json
+import socket
+import threading
+
+from pymodaq.daq_utils.daq_utils import ThreadCommand, set_logger, get_module_name
+
+from pymodaq_pid.server import ListeningServer
+
+logger = set_logger(get_module_name(__file__))
+
+
+def command_from_request(request):
+    """Convert a remote request into the ThreadCommand understood by PIDRunner.queue_command
+
+    Parameters
+    ----------
+    request: (dict) with at least an 'op' key and, depending on the operation, a 'value' key
+
+    Returns
+    -------
+    ThreadCommand or None: None for the 'state' operation that only reads the runner state
+    """
+    op = request.get('op')
+    value = request.get('value')
+    if op == 'setpoint':
+        return ThreadCommand('update_options', dict(setpoint=float(value)))
+    elif op == 'tunings':
+        return ThreadCommand('update_options', dict(tunings=tuple(float(val) for val in value)))
+    elif op == 'output_limits':
+        return ThreadCommand('update_options', dict(output_limits=tuple(value)))
+    elif op == 'sample_time':
+        return ThreadCommand('update_options', dict(sample_time=float(value)))
+    elif op == 'pause':
+        return ThreadCommand('pause_PID', [bool(value)])
+    elif op == 'run':
+        # run_PID alone would switch the PID to auto mode but leave the loop paused, not driving the actuators
+        return ThreadCommand('pause_PID', [False])
+    elif op == 'state':
+        return None
+    raise ValueError(f'Unknown remote operation: {op}')
+
+
+class PIDCommandServer(ListeningServer):
+    """Serve remote requests by submitting them directly to a PIDRunner
+
+    Parameters
+    ----------
+    runner: (PIDRunner) the runner whose command path is exposed
+    address: (str or tuple) (host, port) for a TCP socket or path of a Unix socket
+    timeout: (float) maximum time in seconds to wait for the loop to apply a request
+    """
+
+    name = 'PID remote control'
+
+    def __init__(self, runner, address=('127.0.0.1', 6343), timeout=5.):
+        super().__init__(address)
+        self.runner = runner
+        self.timeout = timeout
+        self._connections = []
+
+    def handle_connection(self, connection, address):
+        self._connections.append(connection)
+        threading.Thread(target=self._serve, args=(connection,), daemon=True).start()
+
+    def _serve(self, connection):
+        try:
+            with connection.makefile('rb') as reader:
+                for line in reader:
+                    if not line.strip():
+                        continue
+                    connection.sendall(json.dumps(self.handle(line)).encode() + b'\n')
+        except OSError as e:
+            logger.info(f'PID remote client disconnected: {str(e)}')
+        finally:
+            if connection in self._connections:
+                self._connections.remove(connection)
+            connection.close()
+
+    def handle(self, line):
+        """Process one request line and return the reply as a dict"""
+        request_id = None
+        try:
+            request = json.loads(line)
+            request_id = request.get('id')
+            command = command_from_request(request)
+            state = self.runner.submit_command(command).result(self.timeout)
+            return dict(id=request_id, ok=True, state=state)
+        except Exception as e:
+            return dict(id=request_id, ok=False, error=f'{type(e).__name__}: {str(e)}')
+
+    def close_connections(self):
+        for connection in self._connections[:]:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class PIDCommandClient:
+    """Blocking client of a PIDCommandServer
+
+    Parameters
+    ----------
+    address: (str or tuple) same address as the server
+    """
+
+    def __init__(self, address=('127.0.0.1', 6343), timeout=5.):
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.socket.connect(address)
+        if family == socket.AF_INET:
+            self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._reader = self.socket.makefile('rb')
+        self._id = 0
+
+    def request(self, op, value=None):
+        """Send a request and wait for its acknowledgement
+
+        Returns
+        -------
+        dict: the runner state once the operation has been applied
+
+        Raises
+        ------
+        RuntimeError: if the server could not apply the operation
+        """
+        self._id += 1
+        self.socket.sendall(json.dumps(dict(id=self._id, op=op, value=value)).encode() + b'\n')
+        reply = json.loads(self._reader.readline())
+        if not reply['ok']:
+            raise RuntimeError(reply['error'])
+        return reply['state']
+
+    def set_setpoint(self, value):
+        return self.request('setpoint', value)
+
+    def set_tunings(self, kp, ki, kd):
+        return self.request('tunings', [kp, ki, kd])
+
+    def set_output_limits(self, output_min=None, output_max=None):
+        return self.request('output_limits', [output_min, output_max])
+
+    def pause(self, pause_state=True):
+        return self.request('pause', pause_state)
+
+    def run(self):
+        return self.request('run')
+
+    def state(self):
+        return self.request('state')
+
+    def close(self):
+        self._reader.close()
+        self.socket.close()
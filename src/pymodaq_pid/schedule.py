@@ -0,0 +1,70 @@
+"""
+Gain scheduling of the PID: the gains are interpolated from a table indexed by the setpoint or the measurement.
+
+The piecewise linear interpolation is precomputed as (offset, slope) coefficients per table segment, so a lookup is
+a segment search, O(1) for uniformly spaced points and a bisection (O(log n)) otherwise, and three multiply-adds.
+Outside the table the gains of its first or last point are used.
+"""
+from bisect import bisect_right
+
+import numpy as np
+
+
+class GainSchedule:
+    """Gains table of a PIDModelGeneric subclass
+
+    Parameters
+    ----------
+    points: (list of float) values of the index (setpoint or measurement), strictly increasing
+    kp, ki, kd: (list of float) gains at each point
+    index: (str) either 'setpoint' or 'measurement', the value used to look up the gains
+    """
+
+    def __init__(self, points, kp, ki, kd, index='setpoint'):
+        if index not in ['setpoint', 'measurement']:
+            raise ValueError(f'Invalid gain schedule index: {index}, possible ones are setpoint and measurement')
+        points = np.asarray(points, dtype=float)
+        gains = np.array([kp, ki, kd], dtype=float)
+        if points.ndim != 1 or len(points) == 0 or gains.shape != (3, len(points)):
+            raise ValueError('The gain schedule needs one value of kp, ki and kd per point')
+        if np.any(np.diff(points) <= 0):
+            raise ValueError('The gain schedule points must be strictly increasing')
+
+        self.index = index
+        self.points = points
+        self.gains = gains
+        self._first = tuple(float(gain) for gain in gains[:, 0])
+        self._last = tuple(float(gain) for gain in gains[:, -1])
+        self._start = float(points[0])
+        self._stop = float(points[-1])
+
+        # gains on segment i: offsets[i] + slopes[i] * x, as python floats to avoid numpy scalars in the loop
+        steps = np.diff(points)
+        slopes = np.diff(gains, axis=1) / steps
+        offsets = gains[:, :-1] - slopes * points[:-1]
+        self._coefficients = [(tuple(offsets[:, ind].tolist()), tuple(slopes[:, ind].tolist()))
+                              for ind in range(len(steps))]
+        self._bounds = points.tolist()
+        self._step = None
+        if len(steps) != 0 and np.allclose(steps, steps[0], rtol=1e-9, atol=0):
+            self._step = float(steps[0])
+
+    @classmethod
+    def from_model(cls, model):
+        """Build the schedule declared by the gain_schedule attribute of a model"""
+        return cls(**model.gain_schedule)
+
+    def segment(self, value):
+        """Index of the table segment containing value, value being within the table"""
+        if self._step is not None:
+            return min(int((value - self._start) / self._step), len(self._coefficients) - 1)
+        return min(bisect_right(self._bounds, value) - 1, len(self._coefficients) - 1)
+
+    def __call__(self, value):
+        """Get the (kp, ki, kd) gains at value"""
+        if value <= self._start:
+            return self._first
+        if value >= self._stop:
+            return self._last
+        offsets, slopes = self._coefficients[self.segment(value)]
+        return (offsets[0] + slopes[0] * value, offsets[1] + slopes[1] * value, offsets[2] + slopes[2] * value)
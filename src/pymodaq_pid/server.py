@@ -0,0 +1,87 @@
+"""
+Listening socket shared by the telemetry publisher and the remote control server: a local TCP or Unix socket whose
+connections are accepted by a daemon thread and handed over to the subclass.
+"""
+import os
+import socket
+import threading
+
+from pymodaq.daq_utils.daq_utils import set_logger, get_module_name
+
+logger = set_logger(get_module_name(__file__))
+
+
+class ListeningServer:
+    """Accept the connections on a local socket, to be subclassed
+
+    Subclasses implement handle_connection and close_connections.
+
+    Parameters
+    ----------
+    address: (str or tuple) either a (host, port) tuple for a TCP socket or a path for a Unix domain socket, port 0
+        letting the system choose a free port (address is then updated by start)
+    """
+    name = 'Server'  # used in the log messages
+
+    def __init__(self, address):
+        self.address = address
+        self._server = None
+        self._accept_thread = None
+
+    @property
+    def is_unix(self):
+        return isinstance(self.address, str)
+
+    def start(self):
+        if self.is_unix:
+            if os.path.exists(self.address):
+                os.remove(self.address)
+            self._server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            self._server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self._server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._server.bind(self.address)
+        self._server.listen()
+        if not self.is_unix:
+            self.address = self._server.getsockname()
+        self._accept_thread = threading.Thread(target=self._accept_loop, daemon=True)
+        self._accept_thread.start()
+        logger.info(f'{self.name} listening on {self.address}')
+
+    def _accept_loop(self):
+        while self._server is not None:
+            try:
+                connection, address = self._server.accept()
+            except OSError:
+                break
+            if self._server is None:  # stopped meanwhile
+                connection.close()
+                break
+            if not self.is_unix:
+                connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.handle_connection(connection, address)
+
+    def handle_connection(self, connection, address):
+        """Serve a new connection, called from the accept thread: must not block"""
+        raise NotImplementedError
+
+    def close_connections(self):
+        """Close the connections served so far, called by stop once no connection can be accepted anymore"""
+        pass
+
+    def stop(self):
+        server = self._server
+        self._server = None
+        if server is not None:
+            try:
+                server.shutdown(socket.SHUT_RDWR)  # wakes up the blocking accept, close alone does not on linux
+            except OSError:
+                pass
+            server.close()
+        if self._accept_thread is not None:
+            self._accept_thread.join(1.)
+            self._accept_thread = None
+        self.close_connections()
+        if self.is_unix and os.path.exists(self.address):
+            os.remove(self.address)
+        logger.info(f'{self.name} stopped')
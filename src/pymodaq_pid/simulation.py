@@ -0,0 +1,186 @@
+"""
+Simulated plants and stand-ins of the Dashboard objects to run a PIDRunner and its model on a virtual clock, hours of
+loop behavior being then simulated in seconds, with identical results on every run.
+
+Example:
+
+    simulation = PIDSimulation(PIDModelSimulated, FirstOrderPlant(gain=2., tau=0.5), setpoint=1.)
+    history = simulation.run(duration=60.)
+"""
+from collections import OrderedDict, deque
+
+import numpy as np
+from pyqtgraph.parametertree import Parameter
+
+from pymodaq_pid.clock import VirtualClock
+from pymodaq_pid.pid_params import params
+from pymodaq_pid.utils import PIDModelGeneric, OutputToActuator
+
+
+class FirstOrderPlant:
+    """First order plant with optional dead time and measurement noise: tau * dy/dt = gain * u(t - delay) - y
+
+    Parameters
+    ----------
+    gain: (float) static gain
+    tau: (float) time constant in seconds
+    delay: (float) dead time in seconds
+    noise: (float) standard deviation of the gaussian noise added to the measurement
+    offset: (float) value of the measurement for a null actuator position
+    seed: (int) seed of the noise generator, making noisy runs reproducible
+    """
+
+    def __init__(self, gain=1., tau=1., delay=0., noise=0., offset=0., seed=0):
+        self.gain = gain
+        self.tau = tau
+        self.delay = delay
+        self.noise = noise
+        self.offset = offset
+        self.seed = seed
+        self.reset()
+
+    def reset(self):
+        self.state = 0.
+        self.time = 0.
+        self._command = 0.
+        self._commands = deque([])  # (time at which it acts on the plant, actuator position) pending commands
+        self._rng = np.random.default_rng(self.seed)
+
+    def set_input(self, time, value):
+        self._commands.append((time + self.delay, value))
+
+    def _integrate(self, stop):
+        if stop > self.time:
+            self.state += (self.gain * self._command - self.state) * (1 - np.exp(-(stop - self.time) / self.tau))
+            self.time = stop
+
+    def measure(self, time):
+        """Integrate the plant up to time and return the (noisy) measurement"""
+        while self._commands and self._commands[0][0] <= time:  # piecewise integration between command changes
+            change_time, command = self._commands.popleft()
+            self._integrate(change_time)
+            self._command = command
+        self._integrate(time)
+        measurement = self.state + self.offset
+        if self.noise:
+            measurement += self._rng.normal(0, self.noise)
+        return measurement
+
+
+class SimulatedModulesManager:
+    """Stand-in of the Dashboard modules manager with one 0D detector measuring a simulated plant and one actuator
+    driving it
+
+    Parameters
+    ----------
+    plant: (FirstOrderPlant) any object with set_input(time, value) and measure(time) methods
+    clock: (VirtualClock) clock shared with the PIDRunner
+    detector_name: (str) name of the simulated detector
+    actuator_name: (str) name of the simulated actuator
+    """
+
+    def __init__(self, plant, clock, detector_name='Plant', actuator_name='Actuator'):
+        self.plant = plant
+        self.clock = clock
+        self.detectors_name = [detector_name]
+        self.actuators_name = [actuator_name]
+        self.selected_detectors_name = [detector_name]
+        self.selected_actuators_name = [actuator_name]
+        self.position = 0.
+        self.history = dict(time=[], measurement=[], position=[])
+
+    def get_mod_from_name(self, name, mod='det'):
+        return None
+
+    def connect_detectors(self, connect=True):
+        pass
+
+    def connect_actuators(self, connect=True):
+        pass
+
+    def grab_datas(self, **kwargs):
+        now = self.clock.now()
+        measurement = self.plant.measure(now)
+        self.history['time'].append(now)
+        self.history['measurement'].append(measurement)
+        self.history['position'].append(self.position)
+        detector_name = self.detectors_name[0]
+        return OrderedDict([(detector_name, OrderedDict(
+            name=detector_name, acq_time_s=self.clock.time(),
+            data0D=OrderedDict([(f'{detector_name}_CH000', OrderedDict(data=np.array([measurement])))])))])
+
+    def move_actuators(self, positions, mode='abs', poll=True):
+        self.position = positions[0] if mode == 'abs' else self.position + positions[0]
+        self.plant.set_input(self.clock.now(), self.position)
+        return positions
+
+
+class PIDModelSimulated(PIDModelGeneric):
+    """Model of the simulated plant: the PID output is the absolute position of the simulated actuator"""
+    konstants = dict(kp=0.5, ki=1., kd=0.)
+    actuators_name = ['Actuator']
+    detectors_name = ['Plant']
+
+    def convert_input(self, measurements):
+        self.curr_input = float(measurements['Plant']['data0D']['Plant_CH000']['data'][0])
+        return self.curr_input
+
+    def convert_output(self, output, dt, stab=True):
+        self.curr_output = output
+        return OutputToActuator('abs', values=[output])
+
+
+class PIDSimulation:
+    """Headless stand-in of DAQ_PID running a model and a PIDRunner against a simulated plant on a virtual clock
+
+    Parameters
+    ----------
+    model_class: (type) PIDModelGeneric subclass, its detectors_name and actuators_name are used for the simulated
+        modules
+    plant: (FirstOrderPlant) the simulated plant
+    setpoint: (float) setpoint of the loop
+    sample_time: (float) sample time of the loop in seconds
+    konstants: (dict) kp, ki and kd, defaults to the model ones
+    output_limits: (tuple) (min, max) limits of the PID output, None for no limit
+    clock: (RealClock or VirtualClock) clock of the loop, defaults to a new VirtualClock
+    """
+
+    def __init__(self, model_class, plant, setpoint=0., sample_time=0.01, konstants=None, output_limits=(None, None),
+                 clock=None):
+        from pymodaq_pid.pid_controller import PIDRunner
+
+        self.clock = VirtualClock() if clock is None else clock
+        self.module_manager = SimulatedModulesManager(plant, self.clock,
+                                                      detector_name=(model_class.detectors_name + ['Plant'])[0],
+                                                      actuator_name=(model_class.actuators_name + ['Actuator'])[0])
+        self.settings = Parameter.create(title='PID settings', name='pid_settings', type='group', children=params)
+        self.settings.child('models', 'model_params').addChildren(model_class.params)
+        self._setpoint = [setpoint]
+
+        self.model_class = model_class(self)
+        if konstants is None:
+            konstants = self.model_class.konstants
+        self.runner = PIDRunner(self.model_class, self.module_manager,
+                                dict(Kp=konstants['kp'], Ki=konstants['ki'], Kd=konstants['kd'], setpoint=setpoint,
+                                     sample_time=sample_time, output_limits=output_limits, auto_mode=False),
+                                clock=self.clock)
+
+    @property
+    def setpoint(self):
+        return self._setpoint
+
+    @setpoint.setter
+    def setpoint(self, values):
+        self._setpoint = values
+
+    def run(self, duration):
+        """Run the stabilization loop for duration (simulated) seconds
+
+        Returns
+        -------
+        dict: time, measurement and (actuator) position lists of every loop iteration since the simulation creation
+        """
+        if not self.runner.pid.auto_mode:
+            self.runner.pause_PID(False)
+        self.runner.start_PID(duration=duration)
+        return self.module_manager.history
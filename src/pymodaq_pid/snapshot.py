@@ -0,0 +1,62 @@
+"""
+Snapshots of the PID loop state (PID internals, last output and model defined extras) used to warm restart a loop.
+"""
+import json
+import os
+import time
+
+SNAPSHOT_VERSION = 1
+
+
+def _to_json(obj):
+    if hasattr(obj, 'tolist'):  # numpy arrays and scalars
+        return obj.tolist()
+    raise TypeError(f'Object of type {type(obj).__name__} cannot be saved in a PID snapshot')
+
+
+def get_pid_state(pid):
+    """Get the internal state of a simple_pid.PID instance as a dict"""
+    return dict(integral=pid._integral, proportional=pid._proportional, derivative=getattr(pid, '_derivative', 0),
+                last_output=pid._last_output, last_input=pid._last_input,
+                last_error=getattr(pid, '_last_error', None), setpoint=pid.setpoint, tunings=list(pid.tunings),
+                output_limits=list(pid.output_limits), sample_time=pid.sample_time, auto_mode=pid.auto_mode)
+
+
+def set_pid_state(pid, state):
+    """Restore the internal state of a simple_pid.PID instance
+
+    The time of the last computation is set to now so that the restored output is kept until the next sample time
+    and the integral and derivative terms are then computed over a single sample.
+    """
+    pid._integral = state['integral']
+    pid._proportional = state['proportional']
+    pid._derivative = state['derivative']
+    pid._last_output = state['last_output']
+    pid._last_input = state['last_input']
+    if hasattr(pid, '_last_error'):
+        pid._last_error = state['last_error']
+    pid._last_time = pid.time_fn() if hasattr(pid, 'time_fn') else time.monotonic()
+
+
+def save_snapshot(snapshot, path):
+    """Atomically write a snapshot in a json file"""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(snapshot, f, default=_to_json)
+    os.replace(tmp_path, path)
+
+
+def load_snapshot(path):
+    """Load a snapshot from a json file
+
+    Returns
+    -------
+    dict or None: the snapshot or None if the file does not exist or is not a compatible snapshot
+    """
+    if not os.path.isfile(path):
+        return None
+    with open(path) as f:
+        snapshot = json.load(f)
+    if snapshot.get('version') != SNAPSHOT_VERSION:
+        return None
+    return snapshot
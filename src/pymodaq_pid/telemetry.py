@@ -0,0 +1,232 @@
+"""
+Telemetry publisher streaming the PID loop state as fixed-layout binary frames to local subscribers.
+
+On connection each subscriber first receives a small header describing the frame layout, then one frame per loop
+iteration:
+
+    header: b'PIDT' | uint16 version | uint16 len(fmt) | fmt (ascii struct format of the frames)
+    frame:  uint64 counter | float64 timestamp (s) | setpoints | inputs | outputs | float64 loop period (s) | uint8 flags
+
+Publishing never blocks the control thread: each subscriber has its own bounded queue emptied by a sender thread,
+when a subscriber is too slow its oldest frames are dropped.
+"""
+import queue
+import socket
+import struct
+import threading
+import time
+
+from pymodaq.daq_utils.daq_utils import set_logger, get_module_name
+
+from pymodaq_pid.server import ListeningServer
+
+logger = set_logger(get_module_name(__file__))
+
+MAGIC = b'PIDT'
+VERSION = 1
+HEADER_FORMAT = '<4sHH'
+
+FLAG_SATURATED_MIN = 0x01
+FLAG_SATURATED_MAX = 0x02
+FLAG_PAUSED = 0x04
+
+
+def frame_format(n_setpoints=1, n_outputs=1):
+    """Get the struct format of a telemetry frame
+
+    Parameters
+    ----------
+    n_setpoints: (int) number of setpoints (and hence inputs) of the loop
+    n_outputs: (int) number of values sent to the actuators
+
+    Returns
+    -------
+    str: the struct format string
+    """
+    return f'<Qd{n_setpoints}d{n_setpoints}d{n_outputs}ddB'
+
+
+def unpack_frame(fmt, buffer, n_setpoints=1, n_outputs=1):
+    """Convert a binary frame into a dict
+
+    Parameters
+    ----------
+    fmt: (str) the struct format as sent in the header
+    buffer: (bytes) the binary frame
+    n_setpoints: (int) number of setpoints of the loop
+    n_outputs: (int) number of outputs of the loop
+
+    Returns
+    -------
+    dict: with keys counter, timestamp, setpoint, input, output, period and flags
+    """
+    values = struct.unpack(fmt, buffer)
+    ind = 2
+    setpoint = list(values[ind:ind + n_setpoints])
+    ind += n_setpoints
+    input = list(values[ind:ind + n_setpoints])
+    ind += n_setpoints
+    output = list(values[ind:ind + n_outputs])
+    ind += n_outputs
+    return dict(counter=values[0], timestamp=values[1], setpoint=setpoint, input=input, output=output,
+                period=values[ind], flags=values[ind + 1])
+
+
+class _Subscriber:
+    def __init__(self, connection, address, maxsize):
+        self.connection = connection
+        self.address = address
+        self.frames = queue.Queue(maxsize)
+        self.dropped = 0
+        self.alive = True
+        self.thread = threading.Thread(target=self.send_loop, daemon=True)
+
+    def push(self, frame):
+        try:
+            self.frames.put_nowait(frame)
+        except queue.Full:
+            try:
+                self.frames.get_nowait()
+                self.dropped += 1
+            except queue.Empty:
+                pass
+            try:
+                self.frames.put_nowait(frame)
+            except queue.Full:
+                self.dropped += 1
+
+    def send_loop(self):
+        try:
+            while self.alive:
+                frame = self.frames.get()
+                if frame is None:
+                    break
+                self.connection.sendall(frame)
+        except OSError as e:
+            logger.info(f'Telemetry subscriber {self.address} disconnected: {str(e)}')
+        finally:
+            self.alive = False
+            try:
+                self.connection.close()
+            except OSError:
+                pass
+
+    def close(self):
+        self.alive = False
+        self.push(None)
+
+
+class TelemetryPublisher(ListeningServer):
+    """Publish the PID loop state to many local subscribers
+
+    Parameters
+    ----------
+    address: (str or tuple) either a (host, port) tuple for a TCP socket or a path for a Unix domain socket
+    n_setpoints: (int) number of setpoints (and inputs) of the loop
+    n_outputs: (int) number of values sent to the actuators
+    queue_size: (int) number of frames buffered per subscriber before dropping the oldest ones
+    """
+
+    name = 'Telemetry publisher'
+
+    def __init__(self, address=('127.0.0.1', 6342), n_setpoints=1, n_outputs=1, queue_size=100):
+        super().__init__(address)
+        self.n_setpoints = n_setpoints
+        self.n_outputs = n_outputs
+        self.queue_size = queue_size
+        self.fmt = frame_format(n_setpoints, n_outputs)
+        self._struct = struct.Struct(self.fmt)
+        self._header = struct.pack(HEADER_FORMAT, MAGIC, VERSION, len(self.fmt)) + self.fmt.encode()
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self.counter = 0
+        self.invalid_frames = 0  # consecutive frames that could not be packed
+
+    @property
+    def subscribers(self):
+        with self._lock:
+            return [sub.address for sub in self._subscribers if sub.alive]
+
+    def handle_connection(self, connection, address):
+        subscriber = _Subscriber(connection, address, self.queue_size)
+        subscriber.push(self._header)
+        with self._lock:
+            self._subscribers = [sub for sub in self._subscribers if sub.alive]
+            self._subscribers.append(subscriber)
+        subscriber.thread.start()
+
+    def publish(self, setpoint, input, output, period, flags=0):
+        """Pack the loop state and queue it for every subscriber, never blocking the caller
+
+        Parameters
+        ----------
+        setpoint: (list of float) current setpoints
+        input: (list of float) current (converted) inputs
+        output: (list of float) values sent to the actuators
+        period: (float) loop period in seconds
+        flags: (int) combination of FLAG_SATURATED_MIN, FLAG_SATURATED_MAX and FLAG_PAUSED
+        """
+        if not self._subscribers:
+            return
+        self.counter += 1
+        try:
+            frame = self._struct.pack(self.counter, time.time(), *setpoint, *input, *output, period, flags)
+        except struct.error as e:
+            # reported once until a valid frame is published again, not on every loop iteration
+            if self.invalid_frames == 0:
+                logger.warning(f'Invalid telemetry frame: {str(e)}')
+            self.invalid_frames += 1
+            return
+        self.invalid_frames = 0
+        with self._lock:
+            subscribers = self._subscribers[:]
+        for subscriber in subscribers:
+            if subscriber.alive:
+                subscriber.push(frame)
+
+    def close_connections(self):
+        with self._lock:
+            for subscriber in self._subscribers:
+                subscriber.close()
+            self._subscribers = []
+
+
+class TelemetryClient:
+    """Minimal subscriber reading the frames sent by a TelemetryPublisher
+
+    Parameters
+    ----------
+    address: (str or tuple) same address as the publisher
+    n_setpoints: (int) number of setpoints of the loop
+    n_outputs: (int) number of outputs of the loop
+    """
+
+    def __init__(self, address=('127.0.0.1', 6342), n_setpoints=1, n_outputs=1, timeout=5.):
+        self.n_setpoints = n_setpoints
+        self.n_outputs = n_outputs
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self.socket = socket.socket(family, socket.SOCK_STREAM)
+        self.socket.settimeout(timeout)
+        self.socket.connect(address)
+
+        magic, version, fmt_len = struct.unpack(HEADER_FORMAT, self._read(struct.calcsize(HEADER_FORMAT)))
+        if magic != MAGIC:
+            raise IOError(f'Invalid telemetry header: {magic}')
+        self.version = version
+        self.fmt = self._read(fmt_len).decode()
+        self.frame_size = struct.calcsize(self.fmt)
+
+    def _read(self, size):
+        buffer = b''
+        while len(buffer) < size:
+            chunk = self.socket.recv(size - len(buffer))
+            if not chunk:
+                raise ConnectionError('Telemetry publisher closed the connection')
+            buffer += chunk
+        return buffer
+
+    def read_frame(self):
+        return unpack_frame(self.fmt, self._read(self.frame_size), self.n_setpoints, self.n_outputs)
+
+    def close(self):
+        self.socket.close()
@@ -0,0 +1,147 @@
+"""
+Precomputed setpoint trajectories stepped through by the PID loop itself.
+"""
+from bisect import bisect_right
+
+import numpy as np
+
+
+class SetpointTrajectory:
+    """Time stamped setpoints to be applied by the PIDRunner
+
+    Parameters
+    ----------
+    times: (ndarray) increasing times in seconds, relative to the start of the trajectory, at which each setpoint
+        becomes active (the first one should be 0)
+    setpoints: (ndarray) setpoint values, same length as times
+    duration: (float) total duration in seconds, defaults to the last time (the last point is then only applied)
+    epsilon: (float) precision at which a point is considered as reached, None to use the one of the PID settings
+        (DAQ_PID.load_trajectory), a trajectory without epsilon skips the settle checks and strictly follows its
+        time stamps
+    settle_time: (float) time in seconds the input has to stay within epsilon for a point to be considered as settled
+    wait_settled: (bool) if True, a point is only left once it is settled (the following time stamps are delayed
+        accordingly), otherwise the time stamps are strictly followed
+    """
+
+    def __init__(self, times, setpoints, duration=None, epsilon=None, settle_time=0., wait_settled=False):
+        self.times = np.asarray(times, dtype=float)
+        self.setpoints = np.asarray(setpoints, dtype=float)
+        if self.times.ndim != 1 or self.times.shape != self.setpoints.shape:
+            raise ValueError('times and setpoints should be 1D arrays of the same length')
+        if len(self.times) == 0:
+            raise ValueError('A trajectory needs at least one point')
+        if np.any(np.diff(self.times) < 0):
+            raise ValueError('The trajectory times should be increasing')
+        self.duration = self.times[-1] if duration is None else duration
+        self.epsilon = epsilon
+        self.settle_time = settle_time
+        self.wait_settled = wait_settled
+
+        self._times = self.times.tolist()  # bisect on a list is faster than on an ndarray for single lookups
+        self.reset()
+
+    @classmethod
+    def linear_ramp(cls, start, stop, ramp_time, sample_time, **kwargs):
+        """Linear ramp from start to stop in ramp_time seconds, sampled every sample_time seconds"""
+        times = np.arange(0, ramp_time + sample_time / 2, sample_time)
+        return cls(times, start + (stop - start) * np.clip(times / ramp_time, 0, 1), **kwargs)
+
+    @classmethod
+    def s_curve(cls, start, stop, ramp_time, sample_time, **kwargs):
+        """Smooth ramp (zero speed and acceleration at both ends) from start to stop in ramp_time seconds"""
+        times = np.arange(0, ramp_time + sample_time / 2, sample_time)
+        x = np.clip(times / ramp_time, 0, 1)
+        return cls(times, start + (stop - start) * x ** 3 * (10 - 15 * x + 6 * x ** 2), **kwargs)
+
+    @classmethod
+    def from_sequence(cls, values, dwell_time, settle_time=0., wait_settled=True, **kwargs):
+        """Sequence of setpoints (as from a DAQ_Scan) each one held at least dwell_time seconds"""
+        times = np.arange(len(values)) * dwell_time
+        return cls(times, values, duration=len(values) * dwell_time, settle_time=settle_time,
+                   wait_settled=wait_settled, **kwargs)
+
+    def __len__(self):
+        return len(self._times)
+
+    def reset(self):
+        self.index = -1
+        self.done = False
+        self.settled = np.zeros(len(self), dtype=bool)
+        self.settle_times = np.full(len(self), np.nan)
+        self._t0 = None
+        self._point_start = None
+        self._in_band_since = None
+
+    def start(self, now):
+        self.reset()
+        self._t0 = now
+        self._point_start = now
+        self.index = 0
+
+    @property
+    def setpoint(self):
+        return self.setpoints[max(self.index, 0)]
+
+    @property
+    def progress(self):
+        return dict(index=self.index, n_points=len(self), progress=(self.index + 1) / len(self),
+                    setpoint=float(self.setpoint), settled=bool(self.settled[self.index]),
+                    settle_time=float(self.settle_times[self.index]), n_settled=int(np.sum(self.settled)),
+                    done=self.done)
+
+    def _advance(self, index, now):
+        self.index = index
+        self._point_start = now
+        self._in_band_since = None
+
+    def update(self, now, measurement):
+        """Update the settle status of the current point and move to the next one if its time has come
+
+        Parameters
+        ----------
+        now: (float) current time in seconds (same clock as the one used for start)
+        measurement: (float) current input of the PID
+
+        Returns
+        -------
+        bool: True if the current point just settled, if it changed or if the trajectory is over
+        """
+        if self.done:
+            return False
+        if self._t0 is None:
+            self.start(now)
+            return True
+
+        changed = False
+        if self.epsilon is None:
+            pass  # no settle check
+        elif abs(measurement - self.setpoints[self.index]) < self.epsilon:
+            if self._in_band_since is None:
+                self._in_band_since = now
+            if not self.settled[self.index] and now - self._in_band_since >= self.settle_time:
+                self.settled[self.index] = True
+                self.settle_times[self.index] = now - self._point_start
+                changed = True
+        else:
+            self._in_band_since = None
+
+        if self.wait_settled and self.epsilon is not None and not self.settled[self.index]:
+            # the time stamps of the next points are delayed until this one is settled
+            next_time = self._times[self.index + 1] if self.index + 1 < len(self) else self.duration
+            if now - self._t0 > next_time:
+                self._t0 = now - next_time
+            return changed
+
+        elapsed = now - self._t0
+        index = bisect_right(self._times, elapsed) - 1
+        if index > self.index:
+            if self.wait_settled and self.epsilon is not None:
+                index = self.index + 1
+                self._t0 = now - self._times[index]
+            self._advance(index, now)
+            return True
+        if self.index == len(self) - 1 and elapsed >= self.duration:
+            # only once the last point has been applied
+            self.done = True
+            return True
+        return changed
@@ -0,0 +1,196 @@
+"""
+Offline tuning of the PID gains and limits: candidates are evaluated on a simulated plant (see simulation.py), spread
+over a process pool, and ranked by their step response performances.
+
+Example:
+
+    results = sweep(gain_grid(kp=[0.1, 0.5, 1.], ki=[0.5, 1., 2.], kd=[0.]), PIDModelSimulated,
+                    partial(FirstOrderPlant, gain=2., tau=0.5), setpoint=1., duration=10.)
+    print(to_model_defaults(results[0]))
+
+or from a terminal: python -m pymodaq_pid.tuning --gain 2 --tau 0.5 --setpoint 1
+"""
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+RANKING_KEYS = ['iae', 'overshoot', 'settling_time', 'travel']
+
+
+def gain_grid(kp=(1.,), ki=(0.1,), kd=(0.,), output_limits=((None, None),)):
+    """Get the list of the candidates of a full grid over the gains and output limits"""
+    return [dict(kp=_kp, ki=_ki, kd=_kd, output_limits=tuple(_limits))
+            for _kp, _ki, _kd, _limits in itertools.product(kp, ki, kd, output_limits)]
+
+
+def candidate_key(candidate):
+    """Hashable identification of a candidate by its gains and output limits"""
+    return (candidate['kp'], candidate['ki'], candidate['kd'], tuple(candidate.get('output_limits', (None, None))))
+
+
+def step_metrics(time, measurement, position, setpoint, settle_band=0.02):
+    """Performances of a step response
+
+    Parameters
+    ----------
+    time, measurement, position: (array like) loop history as returned by PIDSimulation.run
+    setpoint: (float) setpoint of the step
+    settle_band: (float) band around the setpoint, relative to the step amplitude, defining the settling
+
+    Returns
+    -------
+    dict: iae (integrated absolute error), overshoot (relative to the step amplitude), settling_time (s, inf if the
+        loop did not settle) and travel (total actuator travel)
+    """
+    time = np.asarray(time)
+    measurement = np.asarray(measurement)
+    position = np.asarray(position)
+    error = setpoint - measurement
+    step = setpoint - measurement[0]
+    amplitude = abs(step) if step != 0 else 1.
+
+    iae = float(np.sum(np.abs(error[:-1]) * np.diff(time)))
+    overshoot = float(max(0., np.max(-error * np.sign(step)) / amplitude)) if step != 0 else 0.
+    outside = np.nonzero(np.abs(error) > settle_band * amplitude)[0]
+    if len(outside) == 0:
+        settling_time = 0.
+    elif outside[-1] == len(time) - 1:
+        settling_time = np.inf
+    else:
+        settling_time = float(time[outside[-1] + 1] - time[0])
+    travel = float(np.sum(np.abs(np.diff(position))))
+    return dict(iae=iae, overshoot=overshoot, settling_time=settling_time, travel=travel)
+
+
+def evaluate(candidate, model_class, plant_factory, setpoint=1., duration=10., sample_time=0.01):
+    """Simulate a step response with the gains and limits of candidate
+
+    Parameters
+    ----------
+    candidate: (dict) with kp, ki, kd and output_limits keys
+    model_class: (type) PIDModelGeneric subclass compatible with the simulated modules manager
+    plant_factory: (callable) returning a new plant, must be picklable (a class or a functools.partial)
+
+    Returns
+    -------
+    dict: the candidate updated with its step_metrics
+    """
+    from pymodaq_pid.simulation import PIDSimulation
+
+    simulation = PIDSimulation(model_class, plant_factory(), setpoint=setpoint, sample_time=sample_time,
+                               konstants=dict(kp=candidate['kp'], ki=candidate['ki'], kd=candidate['kd']),
+                               output_limits=candidate.get('output_limits', (None, None)))
+    history = simulation.run(duration)
+    result = dict(candidate)
+    result.update(step_metrics(history['time'], history['measurement'], history['position'], setpoint))
+    return result
+
+
+def rank(results, key='iae'):
+    """Sort the results, settled candidates first, then by increasing key (one of RANKING_KEYS)"""
+    if key not in RANKING_KEYS:
+        raise ValueError(f'Unknown ranking key {key}, possible ones are {RANKING_KEYS}')
+    return sorted(results, key=lambda result: (not np.isfinite(result['settling_time']), result[key]))
+
+
+def sweep(candidates, model_class, plant_factory, setpoint=1., duration=10., sample_time=0.01, key='iae',
+          processes=None):
+    """Evaluate candidates in parallel over a process pool
+
+    Returns
+    -------
+    list of dict: the ranked results
+    """
+    evaluate_candidate = partial(evaluate, model_class=model_class, plant_factory=plant_factory, setpoint=setpoint,
+                                 duration=duration, sample_time=sample_time)
+    with ProcessPoolExecutor(processes) as executor:
+        results = list(executor.map(evaluate_candidate, candidates))
+    return rank(results, key)
+
+
+def adaptive_search(initial, model_class, plant_factory, rounds=4, scale=4., key='iae', kd_seed=None, **kwargs):
+    """Coarse to fine search of the gains: each round sweeps kp, ki and kd over (1/scale, 1, scale) times the best
+    candidate so far, scale being then reduced to its square root. While the best kd is 0, kd is swept over 0 and
+    (1/scale, 1, scale) times kd_seed. Candidates already evaluated in a previous round are not evaluated again.
+
+    Parameters
+    ----------
+    initial: (dict) starting candidate, with kp, ki, kd and output_limits keys
+    kd_seed: (float) kd explored while the best kd is 0, if None a tenth of the best kp (or 0.1 if kp is 0)
+    kwargs: passed to sweep
+
+    Returns
+    -------
+    list of dict: the ranked results of all the rounds
+    """
+    best = dict(initial)
+    results = []
+    for ind in range(rounds):
+        factors = [1 / scale, 1., scale]
+        if best['kd']:
+            kd = [best['kd'] * factor for factor in factors]
+        else:
+            seed = kd_seed if kd_seed is not None else (0.1 * abs(best['kp']) if best['kp'] else 0.1)
+            kd = [0.] + [seed * factor for factor in factors]
+        evaluated = set(candidate_key(result) for result in results)
+        candidates = []
+        for candidate in gain_grid(kp=[best['kp'] * factor for factor in factors],
+                                   ki=[best['ki'] * factor for factor in factors],
+                                   kd=kd, output_limits=[best.get('output_limits', (None, None))]):
+            if candidate_key(candidate) not in evaluated:
+                evaluated.add(candidate_key(candidate))
+                candidates.append(candidate)
+        if len(candidates) != 0:
+            results = rank(results + sweep(candidates, model_class, plant_factory, key=key, **kwargs), key)
+        best = results[0]
+        scale = scale ** 0.5
+    return results
+
+
+def to_model_defaults(result):
+    """Get the konstants and limits class attributes of a PIDModelGeneric subclass for a (best) result
+
+    Returns
+    -------
+    str: python source to paste in the model class
+    """
+    output_min, output_max = result.get('output_limits', (None, None))
+    max_value = 1 if output_max is None else output_max
+    min_value = 0 if output_min is None else output_min
+    return (f"konstants = dict(kp={result['kp']:.6g}, ki={result['ki']:.6g}, kd={result['kd']:.6g})\n"
+            f"limits = dict(max=dict(state={output_max is not None}, value={max_value}),\n"
+            f"              min=dict(state={output_min is not None}, value={min_value}),)")
+
+
+def main():
+    from pymodaq_pid.simulation import FirstOrderPlant, PIDModelSimulated
+
+    parser = argparse.ArgumentParser(description='Tune the PID gains on a simulated first order plant')
+    parser.add_argument('--gain', type=float, default=1., help='static gain of the plant')
+    parser.add_argument('--tau', type=float, default=1., help='time constant of the plant (s)')
+    parser.add_argument('--delay', type=float, default=0., help='dead time of the plant (s)')
+    parser.add_argument('--noise', type=float, default=0., help='measurement noise of the plant')
+    parser.add_argument('--setpoint', type=float, default=1.)
+    parser.add_argument('--duration', type=float, default=10., help='simulated duration of each run (s)')
+    parser.add_argument('--sample-time', type=float, default=0.01, help='sample time of the loop (s)')
+    parser.add_argument('--rank', choices=RANKING_KEYS, default='iae')
+    parser.add_argument('--rounds', type=int, default=4, help='rounds of the adaptive search')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+
+    plant_factory = partial(FirstOrderPlant, gain=args.gain, tau=args.tau, delay=args.delay, noise=args.noise)
+    results = adaptive_search(dict(kp=PIDModelSimulated.konstants['kp'], ki=PIDModelSimulated.konstants['ki'],
+                                   kd=PIDModelSimulated.konstants['kd'], output_limits=(None, None)),
+                              PIDModelSimulated, plant_factory, rounds=args.rounds, key=args.rank,
+                              setpoint=args.setpoint, duration=args.duration, sample_time=args.sample_time,
+                              processes=args.processes)
+    for result in results[:10]:
+        print(', '.join([f'{key}={result[key]:.4g}' for key in ['kp', 'ki', 'kd'] + RANKING_KEYS]))
+    print(to_model_defaults(results[0]))
+
+
+if __name__ == '__main__':
+    main()
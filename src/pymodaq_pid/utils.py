@@ -1,13 +1,68 @@
+from collections import OrderedDict
+
+import numpy as np
 from PyQt5.QtCore import pyqtSignal
 from pymodaq.daq_utils.daq_utils import ThreadCommand, get_plugins, set_logger, get_module_name
 
 logger = set_logger(get_module_name(__file__))
 
-DAQ_Move_Stage_type = get_plugins('daq_move')
-DAQ_0DViewer_Det_types = get_plugins('daq_0Dviewer')
-DAQ_1DViewer_Det_types = get_plugins('daq_1Dviewer')
-DAQ_2DViewer_Det_types = get_plugins('daq_2Dviewer')
-DAQ_NDViewer_Det_types = get_plugins('daq_NDviewer')
+# plugin lists are looked for on first access only (see __getattr__), scanning the installed plugins is slow
+_plugin_types = dict(DAQ_Move_Stage_type='daq_move',
+                     DAQ_0DViewer_Det_types='daq_0Dviewer',
+                     DAQ_1DViewer_Det_types='daq_1Dviewer',
+                     DAQ_2DViewer_Det_types='daq_2Dviewer',
+                     DAQ_NDViewer_Det_types='daq_NDviewer')
+
+
+def __getattr__(name):
+    if name in _plugin_types:
+        plugins = get_plugins(_plugin_types[name])
+        globals()[name] = plugins  # cached, next accesses do not go through __getattr__
+        return plugins
+    raise AttributeError(f'module {__name__} has no attribute {name}')
+
+
+def get_acquisition_time(measurements):
+    """Get the acquisition time (in seconds) of the most recent detector data, None if no detector gave one"""
+    times = [det_data['acq_time_s'] for det_data in measurements.values()
+             if isinstance(det_data, dict) and det_data.get('acq_time_s') is not None]
+    return max(times) if len(times) != 0 else None
+
+
+def reduce_measurements(measurements, detectors_channels):
+    """Extract from the detectors data only the channels (and regions of interest) declared by a model
+
+    Parameters
+    ----------
+    measurements: (OrderedDict) data of the detectors as returned by the modules manager grab_datas
+    detectors_channels: (dict) for each detector name, list of (data dimension, channel name, roi) tuples, roi being
+        None (whole channel) or a tuple of slices. Detectors not in this dict are passed as is
+
+    Returns
+    -------
+    OrderedDict: with the same structure as measurements but only the declared channels, the regions of interest
+        being copied so that the full frames are not kept alive
+    """
+    if not detectors_channels:
+        return measurements
+    reduced = OrderedDict([])
+    for det_name, det_data in measurements.items():
+        if det_name not in detectors_channels:
+            reduced[det_name] = det_data
+            continue
+        reduced[det_name] = OrderedDict([(key, value) for key, value in det_data.items()
+                                         if not key.startswith('data')])  # acquisition time, name...
+        for dim, channel, roi in detectors_channels[det_name]:
+            if dim not in det_data:
+                continue
+            for key, channel_data in det_data[dim].items():
+                if key == channel or key.endswith(f'_{channel}'):
+                    channel_data = OrderedDict(channel_data)
+                    if roi is not None:
+                        channel_data['data'] = np.array(channel_data['data'][roi])
+                    reduced[det_name].setdefault(dim, OrderedDict([]))[key] = channel_data
+                    break
+    return reduced
 
 
 class OutputToActuator:
@@ -30,6 +85,22 @@ class PIDModelGeneric:
 
     actuators_name = []
     detectors_name = []
+    # channels and regions of interest of the detectors effectively used by convert_input, only these slices are
+    # kept from the acquired data, e.g. dict(Camera=[('data2D', 'CH000', (slice(100, 150), slice(20, 60)))],
+    #                                        Powermeter=[('data0D', 'CH000', None)])
+    # detectors not declared here are passed whole
+    detectors_channels = dict([])
+
+    # cascaded loops: an outer loop, fed by convert_outer_input, whose output is the setpoint of the PID loop (the
+    # inner loop), e.g. cascade = dict(sample_time=0.1, konstants=dict(kp=1, ki=0.1, kd=0),
+    #                                  limits=dict(max=dict(state=True, value=10), min=dict(state=True, value=-10)))
+    # The user setpoint is then the one of the outer loop, the inner loop runs at the PID sample time
+    cascade = None
+
+    # gain scheduling: gains linearly interpolated from a table indexed by the setpoint or the measurement (input),
+    # replacing the PID constants in the loop, e.g.
+    # gain_schedule = dict(index='setpoint', points=[0, 10, 20], kp=[1, 0.5, 0.2], ki=[0.1, 0.05, 0.05], kd=[0, 0, 0])
+    gain_schedule = None
 
     def __init__(self, pid_controller):
         self.pid_controller = pid_controller  # instance of the pid_controller using this model
@@ -39,6 +110,8 @@ class PIDModelGeneric:
         self.data_names = None
         self.curr_output = None
         self.curr_input = None
+        self.acquisition_time = None  # acquisition time (s, runner clock) of the measurements given to convert_input
+        self.sample_dt = None  # time (s) between the acquisitions of the last two measurements
 
         self.check_modules(pid_controller.module_manager)
 
@@ -76,6 +149,24 @@ class PIDModelGeneric:
             self.data_names.append(name)
 
 
+    def get_state(self):
+        """
+        Get the model internal state to be saved in the PID snapshots (filters, estimators...)
+        To be overwritten in child class
+
+        Returns
+        -------
+        dict: json serializable state given back to set_state on a warm restart
+        """
+        return dict([])
+
+    def set_state(self, state):
+        """
+        Restore the model internal state returned by get_state
+        To be overwritten in child class
+        """
+        pass
+
     def update_settings(self, param):
         """
         Get a parameter instance whose value has been modified by a user on the UI
@@ -89,12 +180,20 @@ class PIDModelGeneric:
         self.setpoint(self.setpoint_ini)
         self.apply_constants()
 
+    def reduce_measurements(self, measurements):
+        """
+        Reduce the acquired data to what convert_input needs, called in the acquisition stage of the loop
+        Can be overwritten in child class, defaults to the extraction of the declared detectors_channels
+        """
+        return reduce_measurements(measurements, self.detectors_channels)
+
     def convert_input(self, measurements):
         """
         Convert the measurements in the units to be fed to the PID (same dimensionality as the setpoint)
         Parameters
         ----------
         measurements: (Ordereddict) Ordereded dict of object from which the model extract a value of the same units as the setpoint
+            their acquisition time is available in self.acquisition_time
 
         Returns
         -------
@@ -103,13 +202,29 @@ class PIDModelGeneric:
         """
         return 0
 
-    def convert_output(self, output, dt):
+    def convert_outer_input(self, measurements):
+        """
+        Convert the measurements into the input of the outer loop (same units as the user setpoint), only called if
+        the model declares a cascade
+        Parameters
+        ----------
+        measurements: (Ordereddict) Ordereded dict of object from which the model extract a value of the same units as the setpoint
+
+        Returns
+        -------
+        float: the converted input of the outer loop
+
+        """
+        return 0
+
+    def convert_output(self, output, dt, stab=True):
         """
         Convert the output of the PID in units to be fed into the actuator
         Parameters
         ----------
         output: (float) output value from the PID from which the model extract a value of the same units as the actuator
-        dt: (float) ellapsed time in seconds since last call
+        dt: (float) ellapsed time in seconds between the acquisitions of the last two measurements
+        stab: (bool) True when called from the stabilization loop
         Returns
         -------
         list: the converted output as a list (in case there are a few actuators)
@@ -0,0 +1,90 @@
+import threading
+from collections import OrderedDict
+
+from pymodaq_pid.broker import AcquisitionBroker, _brokers
+
+
+class ModulesManager:
+    """Stand-in of the Dashboard modules manager counting its acquisitions"""
+
+    def __init__(self, detectors):
+        self.detectors = detectors
+        self.selected_detectors_name = list(detectors.keys())
+        self.grabs = 0
+        self.lock = threading.Lock()
+
+    def get_mod_from_name(self, name, mod='det'):
+        return self.detectors.get(name, None)
+
+    def grab_datas(self, **kwargs):
+        with self.lock:
+            self.grabs += 1
+            return OrderedDict(frame=self.grabs)
+
+
+def test_frames_shared():
+    detectors = dict(det=object())
+    first, second = ModulesManager(detectors), ModulesManager(detectors)
+    sub_first, sub_second = AcquisitionBroker.subscribe(first), AcquisitionBroker.subscribe(second)
+    try:
+        assert sub_first.broker is sub_second.broker
+        frame = sub_first.grab()
+        assert sub_second.grab() is frame  # not seen yet by the second loop: reused
+        assert first.grabs + second.grabs == 1
+        assert sub_second.grab() is not frame  # already seen: a new one is grabbed
+        assert sub_first.broker.grabs == 2
+    finally:
+        sub_first.close()
+        sub_second.close()
+
+
+def test_max_age():
+    manager = ModulesManager(dict(det=object()))
+    sub_first, sub_second = AcquisitionBroker.subscribe(manager), AcquisitionBroker.subscribe(manager)
+    try:
+        frame = sub_first.grab()
+        assert sub_second.grab(max_age=0.) is not frame
+    finally:
+        sub_first.close()
+        sub_second.close()
+
+
+def test_release():
+    detectors = dict(det=object())
+    subscriptions = [AcquisitionBroker.subscribe(ModulesManager(detectors)) for ind in range(2)]
+    broker = subscriptions[0].broker
+    subscriptions[0].grab()
+    subscriptions[0].close()
+    subscriptions[0].close()  # closing twice releases once
+    assert broker.references == 1 and broker.key in _brokers
+    subscriptions[1].close()
+    assert broker.key not in _brokers and broker._frame is None
+    assert AcquisitionBroker.subscribe(ModulesManager(detectors)).broker is not broker
+
+
+class Clock:
+    simulated = True
+
+    def __init__(self):
+        self.time = 0.
+
+    def now(self):
+        return self.time
+
+
+def test_frame_time():
+    clock = Clock()
+    manager = ModulesManager(dict(det=object()))
+    sub_first = AcquisitionBroker.subscribe(manager, clock)
+    sub_second = AcquisitionBroker.subscribe(manager, Clock())  # the broker clock is the one of its creator
+    try:
+        clock.time = 1.
+        frame = sub_first.grab()
+        clock.time = 1.5
+        assert sub_second.grab() is frame
+        assert sub_first.frame_time == sub_second.frame_time == 1.
+        assert sub_second.grab(max_age=0.2) is not frame
+        assert sub_second.frame_time == 1.5
+    finally:
+        sub_first.close()
+        sub_second.close()
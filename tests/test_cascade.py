@@ -0,0 +1,63 @@
+import pytest
+
+from pymodaq_pid.cascade import OuterLoop
+
+
+def make_outer_loop(**kwargs):
+    outer_loop = OuterLoop(sample_time=0.1, konstants=dict(kp=1., ki=1., kd=0.5), setpoint=1., **kwargs)
+    outer_loop.set_auto_mode(True, 0.)
+    return outer_loop
+
+
+def test_schedule_on_time():
+    outer_loop = make_outer_loop()
+    assert outer_loop.due(0.)
+    outer_loop.step(0., 0.)
+    assert not outer_loop.due(0.05)
+    outer_loop.step(0.101, 0.)  # a bit late: the outer rate is kept
+    assert outer_loop.next_time == pytest.approx(0.2)
+
+
+def test_schedule_after_late_step():
+    outer_loop = make_outer_loop()
+    outer_loop.step(0., 0.)
+    outer_loop.step(0.45, 0.)  # more than a sample time late
+    assert outer_loop.next_time == pytest.approx(0.55)
+    assert not outer_loop.due(0.451)
+
+
+def test_limits():
+    outer_loop = make_outer_loop(limits=dict(max=dict(state=True, value=0.5), min=dict(state=False, value=0.)))
+    assert outer_loop.step(0., -10.) == 0.5
+
+
+def test_bumpless_auto_mode():
+    outer_loop = OuterLoop(sample_time=0.1, konstants=dict(kp=2., ki=1., kd=0.), setpoint=1.)
+    assert outer_loop.step(0., 0.) is None  # manual mode
+    outer_loop.set_auto_mode(True, 0.3)
+    assert outer_loop.step(0.1, 1.) == pytest.approx(0.3)  # no error: the output starts from the given one
+    outer_loop.set_auto_mode(False)
+    assert outer_loop.step(0.2, 0.) == pytest.approx(0.3)
+
+
+def test_inner_setpoint_hand_off():
+    pytest.importorskip('pymodaq_pid.pid_controller', exc_type=ImportError)
+    from pymodaq_pid.simulation import PIDSimulation, PIDModelSimulated, FirstOrderPlant
+
+    class PIDModelCascaded(PIDModelSimulated):
+        cascade = dict(sample_time=0.1, konstants=dict(kp=0.5, ki=1., kd=0.))
+
+        def convert_outer_input(self, measurements):
+            return self.curr_input
+
+    simulation = PIDSimulation(PIDModelCascaded, FirstOrderPlant(gain=2., tau=0.5), setpoint=1., sample_time=0.01)
+    runner = simulation.runner
+    assert runner.outer_loop is not None and runner.setpoint == 1.
+    runner.input = 0.2
+    runner.run_PID()
+    assert runner.outer_loop.pid._integral == pytest.approx(0.2)  # bumpless from the inner measurement
+    runner.pause_PID(False)
+    simulation.run(5.)
+    assert runner.pid.setpoint == runner.outer_loop.output
+    assert runner.outer_loop.pid.setpoint == 1.
+    assert runner.process_value == pytest.approx(1., abs=0.05)
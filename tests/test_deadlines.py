@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+
+from pymodaq_pid.deadlines import StageDeadline, StageOverrun
+
+
+def test_no_worker_without_timeout():
+    threads = threading.active_count()
+    deadline = StageDeadline('acquisition', None)
+    assert deadline.run(lambda x: 2 * x, 3) == 6
+    assert threading.active_count() == threads
+
+
+def test_close_stops_worker():
+    deadline = StageDeadline('acquisition', 1.)
+    assert deadline.run(lambda: 1) == 1
+    worker = deadline._worker
+    assert worker.is_alive()
+    deadline.close()
+    worker.join(1.)
+    assert not worker.is_alive()
+    assert deadline.run(lambda: 2) == 2  # restarted on demand
+    deadline.close()
+
+
+def test_refusals_counted_while_busy():
+    release = threading.Event()
+    deadline = StageDeadline('actuation', 0.01)
+    with pytest.raises(StageOverrun) as overrun:
+        deadline.run(release.wait)
+    assert not overrun.value.still_running
+    for refusals in [1, 2, 3]:
+        with pytest.raises(StageOverrun) as overrun:
+            deadline.run(lambda: None)
+        assert overrun.value.still_running and overrun.value.refusals == refusals
+    release.set()
+    time.sleep(0.05)
+    assert deadline.run(lambda: 1) == 1
+    assert deadline.refusals == 0
+    deadline.close()
+
+
+def test_safe_output_sent_once_per_overrun():
+    pytest.importorskip('pymodaq_pid.pid_controller', exc_type=ImportError)
+    from pymodaq_pid.clock import RealClock
+    from pymodaq_pid.simulation import PIDSimulation, PIDModelSimulated, FirstOrderPlant
+
+    simulation = PIDSimulation(PIDModelSimulated, FirstOrderPlant(), setpoint=1., sample_time=0.01, clock=RealClock())
+    runner, module_manager = simulation.runner, simulation.module_manager
+    runner.overrun_policy = 'safe'
+    runner.acquisition_deadline.timeout = 0.05
+    grab_datas = module_manager.grab_datas
+    hang = threading.Event()
+
+    def hung_grab_datas(**kwargs):
+        if not hang.is_set():
+            hang.set()
+            time.sleep(0.5)
+        return grab_datas(**kwargs)
+
+    module_manager.grab_datas = hung_grab_datas
+    moves = []
+    move_actuators = module_manager.move_actuators
+    module_manager.move_actuators = lambda positions, mode='abs', poll=True: \
+        moves.append((list(positions), mode)) or move_actuators(positions, mode, poll)
+    statuses = []
+    runner.status_sig.connect(lambda status: statuses.append(status))
+    simulation.run(1.)
+    assert moves.count(([0.], 'abs')) == 1
+    assert runner.paused
+    assert [status[1]['still_running'] for status in statuses if status[0] == 'overrun'] == [False]
@@ -0,0 +1,141 @@
+import queue
+import threading
+import time
+
+import pytest
+from PyQt5.QtCore import QObject, Qt, pyqtSignal
+
+from pymodaq_pid.dispatch import ActuatorDispatcher
+
+MOVE_TIME = 0.1
+
+
+class Setting:
+    def __init__(self, value):
+        self._value = value
+
+    def child(self, *names):
+        return self
+
+    def value(self):
+        return self._value
+
+
+class Actuator(QObject):
+    """Stand-in of a DAQ_Move taking MOVE_TIME to reach its target, its moves being executed in order by its thread"""
+    command_stage = pyqtSignal(object)
+    move_done_signal = pyqtSignal(str, float)
+
+    def __init__(self, name, controller_id, log):
+        super().__init__()
+        self.name = name
+        self.settings = Setting(controller_id)
+        self.log = log
+        self.position = 0.
+        self.targets = queue.Queue()
+        threading.Thread(target=self.run, daemon=True).start()
+        self.command_stage.connect(self.move, Qt.DirectConnection)
+
+    def move(self, command):
+        self.log.append((time.perf_counter(), self.name, command.command, command.attributes))
+        self.targets.put(command.attributes[0])
+
+    def run(self):
+        while True:
+            position = self.targets.get()
+            time.sleep(MOVE_TIME)
+            self.position = position
+            self.log.append((time.perf_counter(), self.name, 'done', position))
+            self.move_done_signal.emit(self.name, position)
+
+
+class ModulesManager:
+    def __init__(self, controller_ids):
+        self.log = []
+        self.actuators = {name: Actuator(name, controller_id, self.log) for name, controller_id in controller_ids.items()}
+        self.moves = []
+
+    def get_mod_from_name(self, name, mod='act'):
+        return self.actuators.get(name, None)
+
+    def move_actuators(self, positions, mode='abs', poll=True):
+        self.moves.append((positions, mode, poll))
+
+
+def commands(log, name):
+    return [entry for entry in log if entry[1] == name and entry[2] != 'done']
+
+
+def test_grouping_by_controller():
+    manager = ModulesManager(dict(x='ctrl1', y='ctrl1', z='ctrl2', w=None))
+    dispatcher = ActuatorDispatcher(manager, ['x', 'y', 'z', 'w'])
+    try:
+        assert dispatcher.parallel
+        assert [[name for ind, name, actuator, move_done in group.members] for group in dispatcher.groups] == \
+            [['x', 'y'], ['z'], ['w']]
+    finally:
+        dispatcher.close()
+
+
+def test_unknown_actuator_uses_modules_manager():
+    manager = ModulesManager(dict(x='ctrl1'))
+    dispatcher = ActuatorDispatcher(manager, ['x', 'unknown'], wait=True)
+    dispatcher.move([1., 2.])
+    dispatcher.close()
+    assert not dispatcher.parallel
+    assert manager.moves == [([1., 2.], 'abs', True)]
+
+
+def test_wait_groups_concurrently():
+    manager = ModulesManager(dict(x='ctrl1', y='ctrl1', z='ctrl2'))
+    dispatcher = ActuatorDispatcher(manager, ['x', 'y', 'z'], wait=True)
+    try:
+        start = time.perf_counter()
+        dispatcher.move([1., 2., 3.])
+        elapsed = time.perf_counter() - start
+    finally:
+        dispatcher.close()
+    # x then y on the same controller, z concurrently
+    assert 2 * MOVE_TIME <= elapsed < 3 * MOVE_TIME
+    assert [actuator.position for actuator in manager.actuators.values()] == [1., 2., 3.]
+    assert commands(manager.log, 'x')[0][3] == [1., True]  # polling flag forwarded
+    x_done = [entry[0] for entry in manager.log if entry[1] == 'x' and entry[2] == 'done'][0]
+    assert commands(manager.log, 'y')[0][0] >= x_done
+    timings = dispatcher.timings
+    assert list(timings.keys()) == ['x', 'y', 'z']
+    assert all(timing == pytest.approx(MOVE_TIME, abs=0.05) for timing in timings.values())
+
+
+def test_no_wait_serializes_shared_controller():
+    manager = ModulesManager(dict(x='ctrl1', y='ctrl1', z='ctrl2'))
+    dispatcher = ActuatorDispatcher(manager, ['x', 'y', 'z'], wait=False)
+    try:
+        start = time.perf_counter()
+        dispatcher.move([1., 2., 3.])
+        assert time.perf_counter() - start < MOVE_TIME / 2  # the loop does not wait
+        dispatcher.move([4., 5., 6.])  # while x is moving: y, then x and y go to the latest values
+        time.sleep(5 * MOVE_TIME)
+    finally:
+        dispatcher.close()
+    assert [entry[3] for entry in commands(manager.log, 'x')] == [[1., False], [4., False]]
+    assert [entry[3] for entry in commands(manager.log, 'y')] == [[2., False], [5., False]]
+    assert [entry[3] for entry in commands(manager.log, 'z')] == [[3., False], [6., False]]
+    x_done = [entry[0] for entry in manager.log if entry[1] == 'x' and entry[2] == 'done']
+    y_commands = [entry[0] for entry in commands(manager.log, 'y')]
+    assert all(y_command >= done for y_command, done in zip(y_commands, x_done))
+    assert [actuator.position for actuator in manager.actuators.values()] == [4., 5., 6.]
+
+
+def test_set_wait():
+    single = ActuatorDispatcher(ModulesManager(dict(x='ctrl1', z='ctrl2')), ['x', 'z'])
+    assert single._executor is None  # nothing to serialize nor to wait for
+    single.set_wait(True)
+    assert single._executor is not None and single.wait
+    single.set_wait(False)
+    assert single._executor is None
+    single.close()
+
+    shared = ActuatorDispatcher(ModulesManager(dict(x='ctrl1', y='ctrl1')), ['x', 'y'])
+    assert shared._executor is not None  # the shared controller group is serialized in the background
+    shared.close()
+    assert shared._executor is None
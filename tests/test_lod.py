@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+pytest.importorskip('pyqtgraph')
+from pymodaq_pid.lod import MinMaxPyramid  # noqa: E402
+
+
+def make_pyramid(y, factor=4):
+    pyramid = MinMaxPyramid(factor)
+    for x, value in enumerate(y):
+        pyramid.append(float(x), value)
+    return pyramid
+
+
+def test_full_resolution():
+    y = np.random.default_rng(0).normal(size=100)
+    x_out, y_out = make_pyramid(y).query(max_points=200)
+    np.testing.assert_array_equal(x_out, np.arange(100))
+    np.testing.assert_array_equal(y_out, y)
+
+
+def test_decimation_keeps_extrema():
+    y = np.random.default_rng(0).normal(size=10001)
+    y[1234] = 100.
+    y[8765] = -100.
+    pyramid = make_pyramid(y)
+    assert len(pyramid) == len(y)
+    x_out, y_out = pyramid.query(max_points=500)
+    assert len(y_out) <= 500 + 2  # the bucket being filled is appended
+    assert y_out.max() == 100. and y_out.min() == -100.
+    assert x_out[0] == 0. and x_out[-1] <= len(y) - 1
+
+
+def test_query_range():
+    y = np.sin(np.arange(20000) / 100)
+    pyramid = make_pyramid(y)
+    x0, x1 = 5000., 7000.
+    x_out, y_out = pyramid.query(x0, x1, max_points=300)
+    assert len(y_out) <= 300
+    assert x_out[0] <= x0 and x_out[-1] >= x1 - 16  # buckets overlapping the range bounds are kept
+    window = y[int(x0):int(x1) + 1]
+    assert y_out.max() >= window.max() and y_out.min() <= window.min()
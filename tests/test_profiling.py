@@ -0,0 +1,44 @@
+import threading
+
+from pymodaq_pid.deadlines import StageDeadline
+from pymodaq_pid.profiling import LoopProfiler
+
+
+class ModulesManager:
+    def grab_datas(self, **kwargs):
+        return dict()
+
+    def move_actuators(self, positions, mode='abs', poll=True):
+        pass
+
+
+class Runner:
+    """Stand-in of a PIDRunner sharing its modules manager with another loop"""
+
+    def __init__(self, module_manager):
+        self.module_manager = module_manager
+        self.model_class = None
+        self.acquisition_deadline = StageDeadline('acquisition', 1.)
+        self.actuation_deadline = StageDeadline('actuation', None)
+
+    def acquire(self):
+        return self.module_manager.grab_datas()
+
+
+def test_other_loops_not_timed(tmp_path):
+    module_manager = ModulesManager()
+    runner = Runner(module_manager)
+    profiler = LoopProfiler(runner, iterations=1, path=str(tmp_path))
+    profiler.start()
+    try:
+        runner.acquire()  # from the loop thread
+        runner.acquisition_deadline.run(runner.acquire)  # from the stage worker
+        other_loop = threading.Thread(target=module_manager.grab_datas)
+        other_loop.start()
+        other_loop.join()
+    finally:
+        profiler.stop()
+        runner.acquisition_deadline.close()
+    assert len(profiler.timings['acquisition']) == 2
+    assert len(profiler.timings['grab_datas']) == 2
+    assert 'grab_datas' not in module_manager.__dict__
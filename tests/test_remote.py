@@ -0,0 +1,79 @@
+import os
+import socket
+from concurrent.futures import Future
+
+import pytest
+
+from pymodaq_pid.remote import PIDCommandServer, PIDCommandClient, command_from_request
+
+
+class Runner:
+    """Stand-in of PIDRunner.submit_command applying the commands immediately"""
+
+    def __init__(self):
+        self.commands = []
+
+    def submit_command(self, command=None):
+        self.commands.append(command)
+        future = Future()
+        future.set_result(dict(n_commands=len(self.commands)))
+        return future
+
+
+def test_round_trip():
+    runner = Runner()
+    server = PIDCommandServer(runner, ('127.0.0.1', 0))
+    server.start()
+    try:
+        client = PIDCommandClient(server.address)
+        assert client.set_setpoint(1.5) == dict(n_commands=1)
+        assert runner.commands[0].command == 'update_options'
+        assert runner.commands[0].attributes == dict(setpoint=1.5)
+        with pytest.raises(RuntimeError):
+            client.request('unknown')
+        client.close()
+    finally:
+        server.stop()
+
+
+def test_restart_on_same_address():
+    server = PIDCommandServer(Runner(), ('127.0.0.1', 0))
+    server.start()
+    address = server.address
+    server.stop()
+    with pytest.raises(OSError):
+        socket.create_connection(address, timeout=1.).close()
+
+    server = PIDCommandServer(Runner(), address)
+    server.start()
+    try:
+        PIDCommandClient(address).close()
+    finally:
+        server.stop()
+
+
+def test_unix_socket(tmp_path):
+    address = str(tmp_path / 'pid.sock')
+    server = PIDCommandServer(Runner(), address)
+    server.start()
+    try:
+        client = PIDCommandClient(address)
+        assert client.state() == dict(n_commands=1)
+        client.close()
+    finally:
+        server.stop()
+    assert not os.path.exists(address)
+
+
+def test_run_resumes_paused_loop():
+    pytest.importorskip('pymodaq_pid.pid_controller', exc_type=ImportError)
+    from pymodaq_pid.simulation import PIDSimulation, PIDModelSimulated, FirstOrderPlant
+
+    runner = PIDSimulation(PIDModelSimulated, FirstOrderPlant(), setpoint=1.).runner
+    states = []
+    for request in [dict(op='pause', value=True), dict(op='run')]:
+        future = runner.submit_command(command_from_request(request))
+        runner.process_pending_commands()
+        states.append(future.result(1.))
+    assert states[0]['paused']
+    assert not states[1]['paused'] and states[1]['auto_mode']
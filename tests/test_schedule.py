@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from pymodaq_pid.schedule import GainSchedule
+
+
+@pytest.mark.parametrize('points', [[0., 1., 2., 3.], [0., 0.5, 2., 3.]])  # uniform (O(1) lookup) and bisection
+def test_interpolation(points):
+    kp, ki, kd = [1., 2., 4., 3.], [0.1, 0.2, 0.1, 0.], [0., 0., 1., 1.]
+    schedule = GainSchedule(points, kp, ki, kd)
+    for value in np.linspace(points[0], points[-1], 101):
+        assert schedule(value) == pytest.approx((np.interp(value, points, kp), np.interp(value, points, ki),
+                                                 np.interp(value, points, kd)))
+
+
+def test_clamping():
+    schedule = GainSchedule([0., 1.], [1., 2.], [0.1, 0.2], [0., 0.5])
+    assert schedule(-10.) == (1., 0.1, 0.)
+    assert schedule(10.) == (2., 0.2, 0.5)
+
+
+def test_invalid_schedules():
+    with pytest.raises(ValueError):
+        GainSchedule([0., 1.], [1., 2.], [0.1, 0.2], [0., 0.5], index='output')
+    with pytest.raises(ValueError):
+        GainSchedule([0., 1.], [1.], [0.1], [0.])
+    with pytest.raises(ValueError):
+        GainSchedule([1., 0.], [1., 2.], [0.1, 0.2], [0., 0.5])
@@ -0,0 +1,26 @@
+import pytest
+
+pytest.importorskip('pymodaq_pid.pid_controller', exc_type=ImportError)  # needs a pymodaq version it supports
+from pymodaq_pid.simulation import PIDSimulation, PIDModelSimulated, FirstOrderPlant  # noqa: E402
+
+
+def simulate(duration=5., **plant_kwargs):
+    simulation = PIDSimulation(PIDModelSimulated, FirstOrderPlant(**plant_kwargs), setpoint=1., sample_time=0.01,
+                               konstants=dict(kp=0.5, ki=2., kd=0.))
+    history = simulation.run(duration)
+    return {key: list(values) for key, values in history.items()}
+
+
+def test_deterministic():
+    assert simulate(gain=2., tau=0.5, delay=0.05, noise=0.01) == simulate(gain=2., tau=0.5, delay=0.05, noise=0.01)
+
+
+def test_seed():
+    assert simulate(noise=0.01, seed=1)['measurement'] != simulate(noise=0.01, seed=2)['measurement']
+
+
+def test_virtual_time():
+    history = simulate(duration=60., gain=2., tau=0.5)
+    assert history['time'][-1] == pytest.approx(60., abs=0.02)
+    assert len(history['time']) == pytest.approx(6000, abs=2)
+    assert history['measurement'][-1] == pytest.approx(1., abs=0.02)
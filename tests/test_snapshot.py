@@ -0,0 +1,53 @@
+import pytest
+
+pytest.importorskip('pymodaq_pid.pid_controller', exc_type=ImportError)
+from pymodaq_pid.simulation import PIDSimulation, PIDModelSimulated, FirstOrderPlant  # noqa: E402
+from pymodaq_pid.snapshot import load_snapshot, save_snapshot  # noqa: E402
+
+
+def make_simulation():
+    return PIDSimulation(PIDModelSimulated, FirstOrderPlant(gain=2., tau=0.5), setpoint=1., sample_time=0.01,
+                         konstants=dict(kp=0.5, ki=2., kd=0.))
+
+
+def test_warm_restart(tmp_path):
+    path = str(tmp_path / 'snapshot.json')
+    simulation = make_simulation()
+    simulation.runner.set_snapshot_options(path, period=1.)
+    simulation.run(5.)  # saved again when the loop exits
+    saved = simulation.runner.take_snapshot()
+    snapshot = load_snapshot(path)
+    assert snapshot['pid']['integral'] == pytest.approx(saved['pid']['integral'])
+    assert snapshot['output'] == pytest.approx(saved['output']) and snapshot['output'] != 0.
+
+    restarted = make_simulation()
+    runner = restarted.runner
+    runner.restore_snapshot(snapshot)
+    runner.run_PID()  # switching to auto mode resets the integral: the restored state is applied again
+    assert runner.pid._integral == pytest.approx(snapshot['pid']['integral'])
+    assert runner.pid._last_output == pytest.approx(snapshot['output'])
+    runner.pause_PID(False)  # the loop starts paused: resuming keeps the restored state
+    assert runner.pid._integral == pytest.approx(snapshot['pid']['integral'])
+
+    restarted.run(0.01)  # first iteration: the restored output is kept until the next sample time
+    assert restarted.module_manager.position == pytest.approx(snapshot['output'])
+
+
+def test_other_model_not_restored(tmp_path):
+    path = str(tmp_path / 'snapshot.json')
+    simulation = make_simulation()
+    simulation.run(1.)
+    snapshot = simulation.runner.take_snapshot()
+    snapshot['model'] = 'OtherModel'
+    save_snapshot(snapshot, path)
+
+    runner = make_simulation().runner
+    runner.restore_snapshot(load_snapshot(path))
+    assert runner.output != snapshot['output'] and runner._restored_pid_state is None
+
+
+def test_incompatible_snapshot(tmp_path):
+    path = str(tmp_path / 'snapshot.json')
+    assert load_snapshot(path) is None
+    save_snapshot(dict(version=-1), path)
+    assert load_snapshot(path) is None
@@ -0,0 +1,92 @@
+import socket
+import time
+
+import pytest
+
+from pymodaq_pid.telemetry import TelemetryPublisher, TelemetryClient, FLAG_PAUSED
+
+
+def wait_subscribers(publisher, count=1, timeout=2.):
+    start = time.perf_counter()
+    while len(publisher.subscribers) < count:
+        assert time.perf_counter() - start < timeout, 'subscriber not registered'
+        time.sleep(0.01)
+
+
+def test_round_trip():
+    publisher = TelemetryPublisher(('127.0.0.1', 0), n_setpoints=2, n_outputs=1)
+    publisher.start()
+    try:
+        client = TelemetryClient(publisher.address, n_setpoints=2, n_outputs=1)
+        wait_subscribers(publisher)
+        publisher.publish([1., 2.], [0.5, 1.5], [3.], 0.01, FLAG_PAUSED)
+        frame = client.read_frame()
+        assert frame['counter'] == 1
+        assert frame['setpoint'] == [1., 2.]
+        assert frame['input'] == [0.5, 1.5]
+        assert frame['output'] == [3.]
+        assert frame['period'] == pytest.approx(0.01)
+        assert frame['flags'] == FLAG_PAUSED
+        client.close()
+    finally:
+        publisher.stop()
+
+
+def test_restart_on_same_address():
+    publisher = TelemetryPublisher(('127.0.0.1', 0))
+    publisher.start()
+    address = publisher.address
+    publisher.stop()
+    with pytest.raises(OSError):
+        socket.create_connection(address, timeout=1.).close()
+
+    publisher = TelemetryPublisher(address)
+    publisher.start()  # would fail with EADDRINUSE if the first listening socket leaked
+    try:
+        client = TelemetryClient(address)
+        client.close()
+    finally:
+        publisher.stop()
+
+
+def test_invalid_frames_reported_once(monkeypatch):
+    from pymodaq_pid import telemetry
+    warnings = []
+    monkeypatch.setattr(telemetry.logger, 'warning', lambda message: warnings.append(message))
+    publisher = TelemetryPublisher(('127.0.0.1', 0), n_setpoints=1, n_outputs=1)
+    publisher.start()
+    try:
+        client = TelemetryClient(publisher.address)
+        wait_subscribers(publisher)
+        for ind in range(10):
+            publisher.publish([1., 2.], [0.5, 1.5], [3.], 0.01)
+        assert len(warnings) == 1 and publisher.invalid_frames == 10
+        publisher.publish([1.], [0.5], [3.], 0.01)
+        assert publisher.invalid_frames == 0
+        assert client.read_frame()['setpoint'] == [1.]
+        publisher.publish([1., 2.], [0.5, 1.5], [3.], 0.01)
+        assert len(warnings) == 2
+        client.close()
+    finally:
+        publisher.stop()
+
+
+def test_runner_frames_with_several_setpoints():
+    pytest.importorskip('pymodaq_pid.pid_controller', exc_type=ImportError)
+    from pymodaq_pid.simulation import PIDSimulation, PIDModelSimulated, FirstOrderPlant
+
+    class PIDModelTwoSetpoints(PIDModelSimulated):
+        Nsetpoint = 2
+
+    simulation = PIDSimulation(PIDModelTwoSetpoints, FirstOrderPlant(), setpoint=1., sample_time=0.01)
+    runner = simulation.runner
+    runner.set_telemetry(True, ('127.0.0.1', 0))
+    try:
+        client = TelemetryClient(runner.telemetry.address)
+        wait_subscribers(runner.telemetry)
+        simulation.run(0.1)
+        assert runner.telemetry.invalid_frames == 0
+        assert client.read_frame()['setpoint'] == [1.]
+        client.close()
+    finally:
+        runner.set_telemetry(False)
@@ -0,0 +1,83 @@
+from collections import OrderedDict
+
+import numpy as np
+import pytest
+
+from pymodaq_pid.clock import RealClock, VirtualClock
+
+
+def test_clock_epoch():
+    clock = VirtualClock(epoch=1.7e9)
+    clock.advance(2.5)
+    assert clock.time() == 1.7e9 + 2.5
+    assert clock.from_epoch(clock.time()) == 2.5
+    real = RealClock()
+    assert real.from_epoch(real.time()) == pytest.approx(real.now(), abs=0.01)
+
+
+class JitteredManager:
+    """Wraps the simulated modules manager: detector stamps jittered around the sample times, some missing"""
+
+    def __init__(self, module_manager, jitter, missing=()):
+        self.module_manager = module_manager
+        self.jitter = jitter
+        self.missing = missing
+        self.grabs = 0
+        self.stamps = []
+
+    def __getattr__(self, name):
+        return getattr(self.module_manager, name)
+
+    def grab_datas(self, **kwargs):
+        datas = self.module_manager.grab_datas(**kwargs)
+        det_data = OrderedDict(next(iter(datas.values())))
+        if self.grabs in self.missing:
+            del det_data['acq_time_s']
+        else:
+            det_data['acq_time_s'] += self.jitter[self.grabs % len(self.jitter)]
+            self.stamps.append((self.grabs, det_data['acq_time_s']))
+        self.grabs += 1
+        return OrderedDict([(next(iter(datas.keys())), det_data)])
+
+
+def run_jittered(missing=()):
+    pytest.importorskip('pymodaq_pid.pid_controller', exc_type=ImportError)
+    from pymodaq_pid.simulation import PIDSimulation, PIDModelSimulated, FirstOrderPlant
+
+    clock = VirtualClock(epoch=1.7e9)  # detector stamps in seconds since the epoch
+    simulation = PIDSimulation(PIDModelSimulated, FirstOrderPlant(gain=2., tau=0.5), setpoint=1., sample_time=0.01,
+                               clock=clock)
+    runner = simulation.runner
+    manager = JitteredManager(simulation.module_manager, jitter=[0., 0.002, -0.001, 0.003], missing=missing)
+    runner.module_manager = manager
+    dts = []
+    pid = runner.pid
+    call = type(pid).__call__
+    type(pid).__call__ = lambda self, input, dt=None: dts.append(dt) or call(self, input, dt)
+    try:
+        runner.pause_PID(False)
+        runner.start_PID(duration=0.5)
+    finally:
+        type(pid).__call__ = call
+    return runner, manager, dts
+
+
+def test_dt_from_jittered_stamps():
+    runner, manager, dts = run_jittered()
+    stamps = [stamp for ind, stamp in manager.stamps]
+    assert len(dts) == len(stamps) > 40
+    assert dts[0] is None  # no previous acquisition
+    last_computed = stamps[0]
+    for stamp, dt in zip(stamps[1:], dts[1:]):
+        assert dt == pytest.approx(stamp - last_computed, abs=1e-6)
+        # the PID skips the samples closer than its sample time, the following dt spanning from the last computed one
+        if dt >= 0.01:
+            last_computed = stamp
+    assert runner.sample_dt == pytest.approx(stamps[-1] - stamps[-2], abs=1e-6)
+
+
+def test_missing_stamps_never_mix_time_bases():
+    runner, manager, dts = run_jittered(missing=(10, 20, 21))
+    assert all(dt is None or dt < 0.05 for dt in dts)
+    assert runner.sample_dt is not None and runner.sample_dt < 0.05
+    assert abs(runner.pid._integral) < 10
@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from pymodaq_pid.trajectory import SetpointTrajectory
+
+
+def run(trajectory, duration, sample_time=0.01, measurement=None):
+    """Update the trajectory every sample_time until it is done, the measurement following the setpoint by default"""
+    setpoints = []
+    now = 0.
+    while not trajectory.done and now <= duration:
+        trajectory.update(now, trajectory.setpoint if measurement is None else measurement)
+        setpoints.append(float(trajectory.setpoint))
+        now = round(now + sample_time, 9)
+    return setpoints
+
+
+def test_linear_ramp_reaches_stop():
+    trajectory = SetpointTrajectory.linear_ramp(0, 10, 1.0, 0.1, epsilon=0.01)
+    setpoints = run(trajectory, 2.)
+    assert trajectory.done
+    assert setpoints[-1] == pytest.approx(10)
+    assert trajectory.progress['index'] == len(trajectory) - 1
+
+
+def test_s_curve_reaches_stop():
+    trajectory = SetpointTrajectory.s_curve(1, -1, 0.5, 0.05, epsilon=0.01)
+    run(trajectory, 2.)
+    assert trajectory.done
+    assert trajectory.setpoint == pytest.approx(-1)
+
+
+def test_without_epsilon_follows_time_stamps():
+    trajectory = SetpointTrajectory.linear_ramp(0, 10, 1.0, 0.1)
+    setpoints = run(trajectory, 2., measurement=-100.)
+    assert trajectory.done
+    assert setpoints[-1] == pytest.approx(10)
+    assert not np.any(trajectory.settled)
+
+
+def test_sequence_waits_for_settling():
+    trajectory = SetpointTrajectory.from_sequence([1., 2., 3.], dwell_time=0.1, settle_time=0.05, epsilon=0.01)
+    run(trajectory, 0.5, measurement=0.)  # never in band
+    assert not trajectory.done
+    assert trajectory.index == 0
+
+    trajectory.reset()
+    run(trajectory, 5.)
+    assert trajectory.done
+    assert trajectory.setpoint == 3.
+    assert np.all(trajectory.settled)
+
+
+def test_invalid_trajectories():
+    with pytest.raises(ValueError):
+        SetpointTrajectory([0, 1], [0.])
+    with pytest.raises(ValueError):
+        SetpointTrajectory([1, 0], [0., 1.])
@@ -0,0 +1,75 @@
+from functools import partial
+
+import numpy as np
+import pytest
+
+from pymodaq_pid import tuning
+from pymodaq_pid.tuning import adaptive_search, candidate_key, gain_grid, step_metrics, sweep, to_model_defaults
+
+
+def fake_sweep(candidates, model_class, plant_factory, key='iae', **kwargs):
+    """Score the candidates by their distance to kp=2, ki=1, kd=0.5 instead of simulating them"""
+    results = []
+    for candidate in candidates:
+        result = dict(candidate)
+        result.update(iae=abs(np.log(candidate['kp'] / 2)) + abs(np.log(candidate['ki'])) +
+                      abs(candidate['kd'] - 0.5), overshoot=0., settling_time=1., travel=0.)
+        results.append(result)
+    return tuning.rank(results, key)
+
+
+def test_adaptive_search_explores_kd(monkeypatch):
+    monkeypatch.setattr(tuning, 'sweep', fake_sweep)
+    results = adaptive_search(dict(kp=1., ki=1., kd=0., output_limits=(None, None)), None, None, rounds=4)
+    assert results[0]['kd'] != 0.
+
+
+def test_adaptive_search_no_duplicates(monkeypatch):
+    monkeypatch.setattr(tuning, 'sweep', fake_sweep)
+    results = adaptive_search(dict(kp=2., ki=1., kd=0.5, output_limits=(None, None)), None, None, rounds=4)
+    keys = [candidate_key(result) for result in results]
+    assert len(keys) == len(set(keys))
+    assert results[0]['kp'] == 2. and results[0]['ki'] == 1. and results[0]['kd'] == 0.5
+
+
+def test_step_metrics_first_order():
+    time = np.arange(0., 10., 0.001)
+    measurement = 1 - np.exp(-time)
+    position = np.concatenate(([0.], np.ones(len(time) - 1)))
+    metrics = step_metrics(time, measurement, position, 1.)
+    assert metrics['iae'] == pytest.approx(1 - np.exp(-10.), rel=1e-3)
+    assert metrics['overshoot'] == 0.
+    assert metrics['settling_time'] == pytest.approx(np.log(50.), abs=0.002)  # within 2% of the step
+    assert metrics['travel'] == 1.
+
+
+def test_step_metrics_overshoot_and_unsettled():
+    time = np.arange(0., 10., 0.001)
+    underdamped = 1 - np.exp(-0.5 * time) * np.cos(3 * time)
+    metrics = step_metrics(time, underdamped, np.zeros_like(time), 1.)
+    assert metrics['overshoot'] == pytest.approx(underdamped.max() - 1, rel=1e-6) and metrics['overshoot'] > 0.4
+    assert np.isfinite(metrics['settling_time'])
+
+    oscillating = 1 - np.cos(3 * time)
+    assert step_metrics(time, oscillating, np.zeros_like(time), 1.)['settling_time'] == np.inf
+
+
+def test_to_model_defaults():
+    source = to_model_defaults(dict(kp=0.5, ki=2., kd=0.01, output_limits=(None, 3.)))
+    namespace = dict()
+    exec(source, namespace)
+    assert namespace['konstants'] == dict(kp=0.5, ki=2., kd=0.01)
+    assert namespace['limits'] == dict(max=dict(state=True, value=3.), min=dict(state=False, value=0))
+
+
+def test_sweep():
+    pytest.importorskip('pymodaq_pid.pid_controller', exc_type=ImportError)
+    from pymodaq_pid.simulation import PIDModelSimulated, FirstOrderPlant
+
+    candidates = gain_grid(kp=[0.05, 0.5], ki=[2.], kd=[0.])
+    results = sweep(candidates, PIDModelSimulated, partial(FirstOrderPlant, gain=2., tau=0.5), setpoint=1.,
+                    duration=5., processes=1)
+    assert [result['kp'] for result in results] == [0.5, 0.05]  # the faster loop first
+    assert all(key in results[0] for key in tuning.RANKING_KEYS)
+    assert results[0]['iae'] < results[1]['iae']
+    assert np.isfinite(results[0]['settling_time'])
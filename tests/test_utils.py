@@ -0,0 +1,55 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from pymodaq_pid.utils import reduce_measurements
+
+
+def make_measurements():
+    frame = np.arange(100.).reshape(10, 10)
+    return OrderedDict([
+        ('Camera', OrderedDict(name='Camera', acq_time_s=1.5,
+                               data2D=OrderedDict([('Camera_CH000', OrderedDict(data=frame, x_axis=None)),
+                                                   ('Camera_CH001', OrderedDict(data=2 * frame))]),
+                               data0D=OrderedDict([('Camera_CH000_ROI', OrderedDict(data=np.array([3.])))]))),
+        ('Power', OrderedDict(name='Power', data0D=OrderedDict([('Power_CH000', OrderedDict(data=np.array([1.])))]))),
+    ])
+
+
+def test_roi_copied():
+    measurements = make_measurements()
+    reduced = reduce_measurements(measurements, dict(Camera=[('data2D', 'CH000', (slice(2, 4), slice(0, 3)))]))
+    data = reduced['Camera']['data2D']['Camera_CH000']['data']
+    np.testing.assert_array_equal(data, measurements['Camera']['data2D']['Camera_CH000']['data'][2:4, :3])
+    assert data.base is None  # a copy, the full frame is not kept alive
+    assert reduced['Camera']['data2D']['Camera_CH000']['x_axis'] is None
+    assert 'data' in measurements['Camera']['data2D']['Camera_CH000']  # the input is not modified
+    assert measurements['Camera']['data2D']['Camera_CH000']['data'].shape == (10, 10)
+
+
+def test_undeclared_channels_dropped():
+    reduced = reduce_measurements(make_measurements(), dict(Camera=[('data2D', 'CH001', None)]))
+    assert list(reduced['Camera']['data2D'].keys()) == ['Camera_CH001']
+    assert 'data0D' not in reduced['Camera']
+    assert reduced['Camera']['acq_time_s'] == 1.5 and reduced['Camera']['name'] == 'Camera'
+
+
+def test_undeclared_detectors_passed_through():
+    measurements = make_measurements()
+    reduced = reduce_measurements(measurements, dict(Camera=[('data2D', 'CH000', None)]))
+    assert reduced['Power'] is measurements['Power']
+    assert reduce_measurements(measurements, dict()) is measurements
+
+
+def test_channel_keys():
+    measurements = make_measurements()
+    # declared either by their full key or by the channel name after the detector one
+    reduced = reduce_measurements(measurements, dict(Camera=[('data2D', 'Camera_CH001', None),
+                                                             ('data0D', 'CH000_ROI', None),
+                                                             ('data1D', 'CH000', None)]))
+    assert list(reduced['Camera']['data2D'].keys()) == ['Camera_CH001']
+    assert list(reduced['Camera']['data0D'].keys()) == ['Camera_CH000_ROI']
+    assert 'data1D' not in reduced['Camera']
+    # CH000 does not match Camera_CH000_ROI
+    reduced = reduce_measurements(measurements, dict(Camera=[('data0D', 'CH000', None)]))
+    assert 'data0D' not in reduced['Camera']